@@ -0,0 +1,260 @@
+"""
+Cold-start benchmark for the voice chat Lambda functions.
+
+Each sample runs in a fresh Python interpreter, as a Lambda cold start
+does, and measures:
+
+- import: loading lambda_function.py with the shared layer on the path
+          (Lambda's init phase)
+- first:  the first invocation of a handler path with a representative
+          event, including every client it constructs on the way
+- total:  import + first, the cold-start cost of that path
+
+The handlers run unmodified. AWS calls never leave the process: a
+botocore 'before-send' hook answers every request with a canned
+response, so client construction, serialization and signing are paid as
+in Lambda but no network or credentials are needed.
+
+Usage:
+    python benchmarks/cold_start.py [--runs 20] [--function message] [--json]
+    python benchmarks/cold_start.py --save-baseline cold_start_baseline.json
+    python benchmarks/cold_start.py --baseline cold_start_baseline.json
+
+--baseline prints each path's total next to the baseline's. It is a
+report, not a gate: cold-start times vary too much between machines.
+
+Requires boto3 (pip install -r functions/process_audio/requirements.txt).
+"""
+import argparse
+import base64
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIR = os.path.join(REPO_ROOT, 'functions')
+LAYER_DIR = os.path.join(REPO_ROOT, 'layers', 'common', 'python')
+
+FUNCTIONS = ['connect', 'disconnect', 'message', 'process_audio', 'validate_audio']
+
+DOMAIN_NAME = 'example.execute-api.us-east-1.amazonaws.com'
+STAGE = 'dev'
+CONNECTION_ID = 'cold-start-0'
+AUDIO = base64.b64encode(b'\0' * 3200).decode()
+
+CHILD_ENV = {
+    'AWS_ACCESS_KEY_ID': 'benchmark',
+    'AWS_SECRET_ACCESS_KEY': 'benchmark',
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'CONNECTIONS_TABLE': 'connections',
+    'AUDIO_BUCKET': 'audio',
+    'EVENT_BUS_NAME': 'bus',
+}
+
+# Canned response bodies for the JSON-protocol operations whose response
+# the handlers read; everything else gets an empty 200
+RESPONSES = {
+    'DynamoDB_20120810.Scan': {'Items': [{'connectionId': {'S': 'cold-start-1'}}]},
+    'DynamoDB_20120810.UpdateItem': {'Attributes': {'frameSeq': {'N': '1'}}},
+    'AWSEvents.PutEvents': {'FailedEntryCount': 0, 'Entries': [{'EventId': 'cold-start'}]},
+}
+
+
+def websocket_event(route_key, body=None):
+    event = {
+        'requestContext': {
+            'routeKey': route_key,
+            'connectionId': CONNECTION_ID,
+            'domainName': DOMAIN_NAME,
+            'stage': STAGE,
+        }
+    }
+    if body is not None:
+        event['body'] = json.dumps(body)
+    return event
+
+
+def audio_event(status):
+    detail = {
+        'status': status,
+        'message': {'action': 'sendaudio', 'data': AUDIO, 'author': 'cold-start'},
+        'websocket_context': {
+            'domain_name': DOMAIN_NAME,
+            'stage': STAGE,
+            'connection_id': CONNECTION_ID,
+        },
+    }
+    if status == 'PROCESSED':
+        detail['s3_key'] = 'audio/cold-start/frame.pcm'
+    return {'detail-type': 'SendAudioEvent', 'source': 'voice-chat', 'detail': detail}
+
+
+# First event of each function path
+PATHS = {
+    'connect': lambda: websocket_event('$connect'),
+    'disconnect': lambda: websocket_event('$disconnect'),
+    'message:ping': lambda: websocket_event('ping', {'action': 'ping'}),
+    'message:sendaudio': lambda: websocket_event(
+        'sendaudio', {'action': 'sendaudio', 'data': AUDIO, 'author': 'cold-start'}),
+    'process_audio': lambda: audio_event('PENDING'),
+    'validate_audio': lambda: audio_event('PROCESSED'),
+}
+
+
+class CannedBody:
+    """
+    Raw response body for botocore.awsrequest.AWSResponse.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def stream(self, **kwargs):
+        yield self.data
+
+
+def answer_locally(request, **kwargs):
+    """
+    botocore 'before-send' hook returning a canned 200 response.
+    """
+    from botocore.awsrequest import AWSResponse
+    target = request.headers.get('X-Amz-Target')
+    if target is None:
+        # REST protocols (S3, Management API): the handlers ignore the body
+        return AWSResponse(request.url, 200, {}, CannedBody(b''))
+    if isinstance(target, bytes):
+        target = target.decode()
+    body = json.dumps(RESPONSES.get(target, {})).encode()
+    return AWSResponse(request.url, 200, {'Content-Type': 'application/x-amz-json-1.0'}, CannedBody(body))
+
+
+def probe(path_name):
+    """
+    Measures one cold start in the current (fresh) interpreter.
+
+    Args:
+        path_name (str): Key of PATHS
+
+    Returns:
+        dict: import_ms, first_ms and total_ms
+    """
+    function_name = path_name.split(':')[0]
+    sys.path.insert(0, LAYER_DIR)
+
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location(
+        'lambda_function', os.path.join(FUNCTIONS_DIR, function_name, 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    import_ms = (time.perf_counter() - start) * 1000.0
+
+    # Clients are built from boto3's default session; hook it before the
+    # handler builds any
+    import boto3
+    boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register('before-send', answer_locally)
+
+    event = PATHS[path_name]()
+    start = time.perf_counter()
+    response = module.lambda_handler(event, None)
+    first_ms = (time.perf_counter() - start) * 1000.0
+
+    return {
+        'import_ms': import_ms,
+        'first_ms': first_ms,
+        'total_ms': import_ms + first_ms,
+        'status': response.get('statusCode'),
+    }
+
+
+def run_samples(path_name, runs):
+    """
+    Runs the probe in fresh interpreters and collects the samples.
+
+    Args:
+        path_name (str): Key of PATHS
+        runs (int): Number of cold starts to sample
+
+    Returns:
+        list: One probe result per run
+    """
+    env = dict(os.environ)
+    env.update(CHILD_ENV)
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, __file__, '--probe', path_name],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return samples
+
+
+def summarize(samples, key):
+    """
+    Returns median and p90 of one measurement across samples.
+    """
+    values = sorted(sample[key] for sample in samples)
+    p90 = values[min(len(values) - 1, int(round(0.9 * (len(values) - 1))))]
+    return {'median': statistics.median(values), 'p90': p90}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=20, help='cold starts per function path')
+    parser.add_argument('--function', choices=FUNCTIONS, help='only benchmark this function')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--baseline', help='show totals next to this baseline file')
+    parser.add_argument('--save-baseline', help='write results to this baseline file')
+    parser.add_argument('--probe', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(args.probe)))
+        return
+
+    results = {}
+    for path_name in PATHS:
+        if args.function and path_name.split(':')[0] != args.function:
+            continue
+        samples = run_samples(path_name, args.runs)
+        results[path_name] = {
+            'import_ms': summarize(samples, 'import_ms'),
+            'first_ms': summarize(samples, 'first_ms'),
+            'total_ms': summarize(samples, 'total_ms'),
+            'status': sorted({sample['status'] for sample in samples}, key=str),
+        }
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'paths': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['paths']
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'function/path':<20} {'import p50':>11} {'first p50':>10} {'total p50':>10} {'total p90':>10}"
+          f" {'baseline':>9} {'change':>7}  (ms, {args.runs} runs)")
+    for path_name, result in results.items():
+        total = result['total_ms']['median']
+        expected = baseline.get(path_name, {}).get('total_ms', {}).get('median')
+        compared = f"{expected:>9.1f} {total / expected - 1.0:>+7.0%}" if expected else f"{'-':>9} {'-':>7}"
+        print(
+            f"{path_name:<20} "
+            f"{result['import_ms']['median']:>11.1f} {result['first_ms']['median']:>10.1f} "
+            f"{total:>10.1f} {result['total_ms']['p90']:>10.1f} {compared}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,505 @@
+"""
+End-to-end voice traffic load generator for the voice chat pipeline.
+
+Simulates WebSocket clients that connect, ping and send audio in talk
+spurts, and drives the five handlers as the deployed system does:
+
+    connect / disconnect / message  <- client traffic
+    message -> bus -> process_audio -> bus -> validate_audio -> clients
+
+The bus is a local stand-in routing events with the same patterns as the
+EventBridge rules in modules/eventbridge. Everything runs in-process
+against the stand-ins in local_aws.py.
+
+Traffic is scheduled on a virtual clock and executed as fast as the
+handlers allow, so a 60 second scenario may run in a few seconds. The
+handlers read the same virtual clock (it replaces
+voice_common.metrics.clock). Each event starts at its scheduled time and
+time advances by the wall time spent in the handlers (including post
+latency) plus --bus-latency-ms per EventBridge hop. The audio handlers
+invoked through the bus run on one of --concurrency workers and wait for
+one to be free, so frames back up when fan-out is slower than the
+offered load. All workers share the handlers' warm state, as if one
+container served them. Frame ages, playout deadlines and listener backoffs therefore count
+virtual time, and late frames are dropped as they would be at the offered
+rate. The report shows:
+
+- offered load (virtual) and achieved processing rate (wall clock)
+- end-to-end delivery latency: virtual time from the scheduled send to
+  each post_to_connection, including time queued for a worker
+- listener latency excluding slow connections, to check that slow
+  listeners do not delay the rest of the room
+- drop rate: deliveries expected by connected listeners vs. made, and
+  frames validate_audio dropped as expired or out of order
+- the longest a frame waited for a worker (backlog)
+- cost counts: DynamoDB scans/reads/writes, S3 PUTs, EventBridge
+  PutEvents and post_to_connection calls, total and per frame
+
+Schedules can be saved with --record and replayed with --replay. A trace
+is JSON lines, one event per line, ordered by time:
+
+    {"t": 1520.0, "type": "connect", "connection": "c3-0"}
+    {"t": 1600.0, "type": "sendaudio", "connection": "c3-0", "bytes": 3200}
+    {"t": 9000.0, "type": "ping", "connection": "c3-0"}
+    {"t": 9500.0, "type": "disconnect", "connection": "c3-0"}
+    {"t": 9700.0, "type": "drop", "connection": "c5-1"}
+
+'drop' is a connection lost without a $disconnect, which leaves a stale
+record that is only cleaned up by a GoneException during broadcast.
+A connect may carry "slow": true to make that connection a slow listener
+(--slow-latency-ms, --slow-error-rate); generated schedules mark the
+sessions of the first --slow-clients clients. Connection IDs are opaque,
+so traces captured from API Gateway replay unchanged.
+"""
+import argparse
+import base64
+import heapq
+import json
+import os
+import random
+import sys
+import time
+
+import local_aws
+from local_aws import LocalDynamoDB, LocalEventBus, LocalManagementApi, LocalS3, quiet_output
+
+from voice_common import metrics
+from voice_common.metrics import percentile
+
+
+def generate_schedule(args):
+    """
+    Generates client traffic on a virtual clock.
+
+    Each client connects during the first second, then alternates talk
+    spurts and silences with exponentially distributed lengths whose means
+    give the requested talk ratio. While talking it sends one frame every
+    --frame-ms. Clients ping every --ping-interval-s, and with --churn-per-min
+    end their session (cleanly or, with --abrupt-ratio, by dropping) and
+    reconnect after --reconnect-ms under a new connection ID.
+
+    Returns:
+        list: Trace events sorted by time
+    """
+    rng = random.Random(args.seed)
+    duration = args.duration_s * 1000.0
+    mean_talk = args.mean_talk_ms
+    mean_silence = mean_talk * (1.0 - args.talk_ratio) / args.talk_ratio if args.talk_ratio < 1 else 0.0
+    churn_rate = args.churn_per_min / 60000.0
+    ping_interval = args.ping_interval_s * 1000.0
+    events = []
+
+    for client in range(args.clients):
+        t = rng.uniform(0, 1000.0)
+        session = 0
+        while t < duration:
+            connection = f"c{client}-{session}"
+            connect = {'t': round(t, 3), 'type': 'connect', 'connection': connection}
+            if client < args.slow_clients:
+                connect['slow'] = True
+            events.append(connect)
+            session_end = t + rng.expovariate(churn_rate) if churn_rate else float('inf')
+            end = min(session_end, duration)
+
+            cursor = t
+            talking = rng.random() < args.talk_ratio
+            while cursor < end:
+                mean = mean_talk if talking else mean_silence
+                segment_end = min(cursor + (rng.expovariate(1.0 / mean) if mean else float('inf')), end)
+                if talking:
+                    frame_time = cursor
+                    while frame_time < segment_end:
+                        events.append({'t': round(frame_time, 3), 'type': 'sendaudio',
+                                        'connection': connection, 'bytes': args.frame_bytes})
+                        frame_time += args.frame_ms
+                cursor = segment_end
+                talking = not talking
+
+            if ping_interval:
+                ping_time = t + ping_interval
+                while ping_time < end:
+                    events.append({'t': round(ping_time, 3), 'type': 'ping', 'connection': connection})
+                    ping_time += ping_interval
+
+            if session_end >= duration:
+                break
+            kind = 'drop' if rng.random() < args.abrupt_ratio else 'disconnect'
+            events.append({'t': round(session_end, 3), 'type': kind, 'connection': connection})
+            t = session_end + args.reconnect_ms
+            session += 1
+
+    # Connection lifecycle events sort before traffic at the same instant
+    order = {'connect': 0, 'ping': 1, 'sendaudio': 1, 'disconnect': 2, 'drop': 2}
+    events.sort(key=lambda event: (event['t'], order[event['type']]))
+    return events
+
+
+def read_schedule(path):
+    """
+    Reads a JSON lines trace.
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_schedule(path, events):
+    """
+    Writes a trace as JSON lines.
+    """
+    with open(path, 'w') as f:
+        for event in events:
+            f.write(json.dumps(event) + '\n')
+
+
+class VirtualClock:
+    """
+    Epoch clock the handlers read while a schedule runs.
+
+    begin() moves the clock to the virtual time an event starts at. While
+    the event runs, the clock advances with the wall time spent since then
+    plus the modeled delay added by the pipeline (bus hops).
+    """
+
+    def __init__(self):
+        self.origin_s = time.time()
+        self.start_ms = 0.0
+        self.started = time.perf_counter()
+        self.delay_ms = 0.0
+
+    def begin(self, start_ms):
+        self.start_ms = start_ms
+        self.started = time.perf_counter()
+        self.delay_ms = 0.0
+
+    def busy_ms(self):
+        """
+        Returns the wall time spent on the current event.
+        """
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def now_ms(self):
+        """
+        Returns virtual milliseconds on the schedule's time line.
+        """
+        return self.start_ms + self.busy_ms() + self.delay_ms
+
+    def __call__(self):
+        return self.origin_s + self.now_ms() / 1000.0
+
+
+class Pipeline:
+    """
+    The five handlers wired together through local stand-ins.
+
+    Deliveries are attributed to the frame being processed: the pipeline
+    runs synchronously, so every post made while a frame is in flight
+    belongs to it.
+    """
+
+    def __init__(self, args):
+        self.connect = local_aws.load_function('connect')
+        self.disconnect = local_aws.load_function('disconnect')
+        self.message = local_aws.load_function('message')
+        self.process_audio = local_aws.load_function('process_audio')
+        self.validate_audio = local_aws.load_function('validate_audio')
+
+        self.bus_latency_ms = args.bus_latency_ms
+        self.clock = VirtualClock()
+        # Virtual time at which each worker for the bus-invoked handlers
+        # is free again, and the worker of the event in flight
+        self.workers = [0.0] * max(1, args.concurrency)
+        self.worker = None
+        self.max_queue_ms = 0.0
+        self.dynamodb = LocalDynamoDB()
+        self.s3 = LocalS3()
+        self.events = LocalEventBus(on_publish=self.route)
+        self.management_api = LocalManagementApi(
+            latency_ms=args.post_latency_ms,
+            jitter_ms=args.post_jitter_ms,
+            error_rate=args.error_rate,
+            slow_latency_ms=args.slow_latency_ms,
+            slow_error_rate=args.slow_error_rate,
+            seed=args.seed,
+            on_deliver=self.deliver,
+        )
+        local_aws.install(
+            dynamodb=self.dynamodb,
+            s3=self.s3,
+            events=self.events,
+            management_api=self.management_api,
+        )
+
+        self.alive = set()
+        self.audio = {}
+        self.frame = None
+        self.stats = {
+            'frames': 0,
+            'pings': 0,
+            'pongs': 0,
+            'connects': 0,
+            'disconnects': 0,
+            'drops': 0,
+            'expected': 0,
+            'delivered': 0,
+            'echoes': 0,
+            'expired': 0,
+            'out_of_order': 0,
+            'routed_process': 0,
+            'routed_validate': 0,
+            'unrouted': 0,
+        }
+        self.latencies = []
+        self.healthy_latencies = []
+
+    def route(self, entry):
+        """
+        Delivers a published event to the target of the matching rule,
+        mirroring the audio processing and validation rules.
+        """
+        detail = json.loads(entry['Detail'])
+        message = detail.get('message', {})
+        context = detail.get('websocket_context', {})
+        if entry['DetailType'] != 'SendAudioEvent':
+            self.stats['unrouted'] += 1
+        elif detail.get('status') == 'PENDING' and message.get('action') == 'sendaudio' and 'data' in message:
+            self.stats['routed_process'] += 1
+            self.hop()
+            self.process_audio.lambda_handler(local_aws.eventbridge_event(entry), None)
+        elif (detail.get('status') == 'PROCESSED' and 's3_key' in detail
+              and all(key in context for key in ('domain_name', 'stage', 'connection_id'))
+              and 'data' in message and 'author' in message):
+            self.stats['routed_validate'] += 1
+            self.hop()
+            response = self.validate_audio.lambda_handler(local_aws.eventbridge_event(entry), None)
+            reason = json.loads(response.get('body', '{}')).get('reason')
+            if reason in ('expired', 'out_of_order'):
+                self.stats[reason] += 1
+        else:
+            self.stats['unrouted'] += 1
+
+    def hop(self):
+        """
+        Accounts for one EventBridge hop. The first hop of an event waits
+        for a free worker.
+        """
+        self.clock.delay_ms += self.bus_latency_ms
+        if self.worker is None:
+            arrival = self.clock.now_ms()
+            start = max(arrival, heapq.heappop(self.workers))
+            self.max_queue_ms = max(self.max_queue_ms, start - arrival)
+            self.clock.delay_ms += start - arrival
+            # Worker start on the virtual clock and on the event's busy time
+            self.worker = (start, self.clock.busy_ms())
+
+    def deliver(self, connection_id, data):
+        """
+        Records a successful post_to_connection.
+        """
+        frame = self.frame
+        if frame is None:
+            self.stats['pongs'] += 1
+            return
+        if connection_id == frame['sender']:
+            self.stats['echoes'] += 1
+            return
+        if connection_id in self.alive:
+            self.stats['delivered'] += 1
+            elapsed = self.clock.now_ms() - frame['sent_at']
+            self.latencies.append(elapsed)
+            if connection_id not in self.management_api.slow_connections:
+                self.healthy_latencies.append(elapsed)
+
+    def audio_for(self, size):
+        audio = self.audio.get(size)
+        if audio is None:
+            audio = self.audio[size] = base64.b64encode(os.urandom(size)).decode()
+        return audio
+
+    def run_event(self, event):
+        """
+        Executes one trace event against the handlers at its scheduled
+        virtual time.
+        """
+        self.clock.begin(event['t'])
+        try:
+            self.handle(event)
+        finally:
+            if self.worker is not None:
+                start, busy_ms = self.worker
+                heapq.heappush(self.workers, start + self.clock.busy_ms() - busy_ms)
+                self.worker = None
+
+    def handle(self, event):
+        kind = event['type']
+        connection = event['connection']
+        if kind == 'connect':
+            self.stats['connects'] += 1
+            self.alive.add(connection)
+            self.management_api.gone.discard(connection)
+            if event.get('slow'):
+                self.management_api.slow_connections.add(connection)
+            self.connect.lambda_handler(local_aws.websocket_event(connection, route_key='$connect'), None)
+        elif kind == 'disconnect':
+            self.stats['disconnects'] += 1
+            self.alive.discard(connection)
+            self.disconnect.lambda_handler(local_aws.websocket_event(connection, route_key='$disconnect'), None)
+        elif kind == 'drop':
+            self.stats['drops'] += 1
+            self.alive.discard(connection)
+            self.management_api.gone.add(connection)
+        elif kind == 'ping':
+            self.stats['pings'] += 1
+            body = json.dumps({'action': 'ping'})
+            self.message.lambda_handler(local_aws.websocket_event(connection, body, 'ping'), None)
+        elif kind == 'sendaudio':
+            self.stats['frames'] += 1
+            self.stats['expected'] += len(self.alive) - (1 if connection in self.alive else 0)
+            body = json.dumps({
+                'action': 'sendaudio',
+                'data': self.audio_for(event.get('bytes', 3200)),
+                'author': connection.split('-')[0],
+            })
+            self.frame = {'sender': connection, 'sent_at': event['t']}
+            try:
+                self.message.lambda_handler(local_aws.websocket_event(connection, body, 'sendaudio'), None)
+            finally:
+                self.frame = None
+
+    def cost_counts(self):
+        """
+        Returns the calls made to each stand-in.
+        """
+        return {
+            'dynamodb_scan': self.dynamodb.calls.get('scan', 0),
+            'dynamodb_get': self.dynamodb.calls.get('get_item', 0),
+            'dynamodb_put': self.dynamodb.calls.get('put_item', 0),
+            'dynamodb_update': self.dynamodb.calls.get('update_item', 0),
+            'dynamodb_delete': self.dynamodb.calls.get('delete_item', 0),
+            's3_put': self.s3.calls.get('put_object', 0),
+            'events_put': self.events.calls.get('put_events', 0),
+            'post_to_connection': self.management_api.calls.get('post_to_connection', 0),
+        }
+
+
+def run(args, events):
+    """
+    Replays a schedule through the pipeline and summarizes the results.
+    """
+    pipeline = Pipeline(args)
+    started = time.perf_counter()
+    metrics.clock = pipeline.clock
+    try:
+        with quiet_output():
+            for event in events:
+                pipeline.run_event(event)
+    finally:
+        metrics.clock = time.time
+    wall_s = time.perf_counter() - started
+
+    stats = pipeline.stats
+    virtual_s = (events[-1]['t'] - events[0]['t']) / 1000.0 if len(events) > 1 else 0.0
+    frames = stats['frames']
+    costs = pipeline.cost_counts()
+    latencies = pipeline.latencies
+    healthy = pipeline.healthy_latencies
+    return {
+        'events': len(events),
+        'virtual_seconds': virtual_s,
+        'wall_seconds': wall_s,
+        'offered_frames_per_s': frames / virtual_s if virtual_s else 0.0,
+        'processed_frames_per_s': frames / wall_s if wall_s else 0.0,
+        'stats': stats,
+        'drop_rate': 1.0 - stats['delivered'] / stats['expected'] if stats['expected'] else 0.0,
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': max(latencies) if latencies else None,
+        },
+        'max_queue_ms': pipeline.max_queue_ms,
+        'slow_connections': len(pipeline.management_api.slow_connections),
+        'healthy_latency_ms': {
+            'p50': percentile(healthy, 50),
+            'p99': percentile(healthy, 99),
+        },
+        'costs': costs,
+        'costs_per_frame': {name: count / frames for name, count in costs.items()} if frames else {},
+    }
+
+
+def print_report(report):
+    stats = report['stats']
+    print(f"events: {report['events']}  virtual: {report['virtual_seconds']:.1f} s  "
+          f"wall: {report['wall_seconds']:.2f} s")
+    print(f"frames: {stats['frames']}  offered: {report['offered_frames_per_s']:.1f} frames/s  "
+          f"processed: {report['processed_frames_per_s']:.1f} frames/s (one process)")
+    print(f"connects: {stats['connects']}  disconnects: {stats['disconnects']}  drops: {stats['drops']}  "
+          f"pings: {stats['pings']}  pongs: {stats['pongs']}")
+    print(f"deliveries: {stats['delivered']}/{stats['expected']}  drop rate: {report['drop_rate']:.2%}  "
+          f"echoes: {stats['echoes']}")
+    print(f"frames dropped: expired {stats['expired']}  out of order {stats['out_of_order']}  "
+          f"max queue delay: {report['max_queue_ms']:.1f} ms")
+    latency = report['latency_ms']
+    if latency['p50'] is not None:
+        print(f"delivery latency ms: p50 {latency['p50']:.2f}  p95 {latency['p95']:.2f}  "
+              f"p99 {latency['p99']:.2f}  max {latency['max']:.2f}")
+    healthy = report['healthy_latency_ms']
+    if report['slow_connections'] and healthy['p50'] is not None:
+        print(f"excluding {report['slow_connections']} slow connections: "
+              f"p50 {healthy['p50']:.2f}  p99 {healthy['p99']:.2f}")
+    print(f"{'cost':<20} {'total':>10} {'per frame':>10}")
+    for name, count in report['costs'].items():
+        per_frame = report['costs_per_frame'].get(name, 0.0)
+        print(f"{name:<20} {count:>10} {per_frame:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    traffic = parser.add_argument_group('traffic')
+    traffic.add_argument('--clients', type=int, default=20)
+    traffic.add_argument('--duration-s', type=float, default=30.0)
+    traffic.add_argument('--frame-ms', type=float, default=100.0, help='interval between frames while talking')
+    traffic.add_argument('--frame-bytes', type=int, default=3200, help='decoded frame size (100 ms of 16 kHz PCM16)')
+    traffic.add_argument('--talk-ratio', type=float, default=0.3, help='fraction of time each client talks')
+    traffic.add_argument('--mean-talk-ms', type=float, default=1500.0, help='mean talk spurt length')
+    traffic.add_argument('--ping-interval-s', type=float, default=30.0, help='0 disables pings')
+    traffic.add_argument('--churn-per-min', type=float, default=0.5, help='session ends per client per minute')
+    traffic.add_argument('--abrupt-ratio', type=float, default=0.2, help='fraction of session ends without $disconnect')
+    traffic.add_argument('--reconnect-ms', type=float, default=1000.0)
+    traffic.add_argument('--seed', type=int, default=1)
+    network = parser.add_argument_group('stand-ins')
+    network.add_argument('--concurrency', type=int, default=10,
+                         help='workers for the bus-invoked audio handlers (Lambda concurrency)')
+    network.add_argument('--bus-latency-ms', type=float, default=0.0, help='modeled (virtual) latency per EventBridge hop')
+    network.add_argument('--post-latency-ms', type=float, default=0.0, help='real delay per post_to_connection')
+    network.add_argument('--post-jitter-ms', type=float, default=0.0)
+    network.add_argument('--error-rate', type=float, default=0.0, help='throttling error probability per post')
+    network.add_argument('--slow-clients', type=int, default=0, help='generated clients whose posts are slow and/or throttled')
+    network.add_argument('--slow-latency-ms', type=float, default=20.0, help='extra delay per post to a slow client (above SLOW_CONSUMER_LAGGING_MS)')
+    network.add_argument('--slow-error-rate', type=float, default=0.0, help='throttling error probability for slow clients')
+    parser.add_argument('--record', help='write the generated schedule to this trace file')
+    parser.add_argument('--replay', help='replay this trace file instead of generating traffic')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    if args.replay:
+        events = read_schedule(args.replay)
+    else:
+        if not 0 < args.talk_ratio <= 1:
+            parser.error('--talk-ratio must be in (0, 1]')
+        events = generate_schedule(args)
+    if args.record:
+        write_schedule(args.record, events)
+    if not events:
+        print("Empty schedule", file=sys.stderr)
+        sys.exit(1)
+
+    report = run(args, events)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,452 @@
+"""
+In-memory stand-ins for the AWS services used by the voice chat functions.
+
+The stand-ins implement only the calls the handlers make, with the same
+request and response shapes as boto3. They are installed into the
+voice_common.clients cache, so the handlers run unmodified and never
+construct a boto3 client (boto3 must still be installed, as the handlers
+import it). Every stand-in counts its calls in a `calls` dict, which
+the benchmarks report as per-stage cost counts.
+
+- LocalDynamoDB:      client API (scan, update_item, delete_item) and
+                      Table resources (put/get/update/delete_item, scan)
+- LocalS3:            put_object / get_object
+- LocalEventBus:      put_events
+- LocalManagementApi: post_to_connection with configurable latency,
+                      GoneException rate and error rate, globally or for
+                      a set of slow listeners
+"""
+import contextlib
+import importlib.util
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+import uuid
+
+from botocore.exceptions import ClientError
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIR = os.path.join(REPO_ROOT, 'functions')
+LAYER_DIR = os.path.join(REPO_ROOT, 'layers', 'common', 'python')
+
+if LAYER_DIR not in sys.path:
+    sys.path.insert(0, LAYER_DIR)
+
+from voice_common import clients  # noqa: E402
+
+CONNECTIONS_TABLE = 'local-connections'
+AUDIO_BUCKET = 'local-audio'
+EVENT_BUS_NAME = 'local-bus'
+DOMAIN_NAME = 'local.execute-api.localhost'
+STAGE = 'bench'
+ENDPOINT_URL = f"https://{DOMAIN_NAME}/{STAGE}"
+
+ENVIRONMENT = {
+    'CONNECTIONS_TABLE': CONNECTIONS_TABLE,
+    'AUDIO_BUCKET': AUDIO_BUCKET,
+    'EVENT_BUS_NAME': EVENT_BUS_NAME,
+    'EVENT_SOURCE': 'voice-chat',
+}
+
+
+def _error_response(code, message=''):
+    return {'Error': {'Code': code, 'Message': message}}
+
+
+class GoneException(ClientError):
+    """
+    Raised by LocalManagementApi for disconnected clients, as a ClientError
+    with the same code and message as botocore's.
+    """
+
+    def __init__(self):
+        super().__init__(_error_response('GoneException'), 'PostToConnection')
+
+
+class ConditionalCheckFailedException(ClientError):
+    """
+    Raised by LocalDynamoDB.update_item when the condition fails. Like
+    botocore's, `response['Item']` holds the old item if it was requested.
+    """
+
+    def __init__(self, item=None):
+        response = _error_response('ConditionalCheckFailedException', 'The conditional request failed')
+        if item is not None:
+            response['Item'] = item
+        super().__init__(response, 'UpdateItem')
+
+
+class LimitExceededException(ClientError):
+    """
+    Raised by LocalManagementApi for injected throttling errors.
+    """
+
+    def __init__(self):
+        super().__init__(_error_response('LimitExceededException'), 'PostToConnection')
+
+
+def _count(calls, operation):
+    calls[operation] = calls.get(operation, 0) + 1
+
+
+def _to_attribute(value):
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float)):
+        return {'N': str(value)}
+    return {'S': str(value)}
+
+
+def _from_attribute(value):
+    (kind, raw), = value.items()
+    return float(raw) if kind == 'N' else raw
+
+
+def _condition(expression, item, values):
+    """
+    Evaluates the condition expressions the handlers use: attribute_exists,
+    attribute_not_exists and name < :value comparisons joined with AND/OR.
+    """
+    python = re.sub(r'attribute_exists\((\w+)\)', r"('\1' in item)", expression)
+    python = re.sub(r'attribute_not_exists\((\w+)\)', r"('\1' not in item)", python)
+    python = re.sub(r'(\w+) (<|>|=) (:\w+)',
+                    lambda m: f"(item.get('{m[1]}') is not None and item['{m[1]}'] "
+                              f"{'==' if m[2] == '=' else m[2]} values['{m[3]}'])", python)
+    python = python.replace(' AND ', ' and ').replace(' OR ', ' or ')
+    return eval(python, {}, {'item': item, 'values': values})
+
+
+def _update(item, expression, values):
+    """
+    Applies a single-clause 'SET name = :value' or 'ADD name :value' update.
+    """
+    action, rest = expression.split(' ', 1)
+    if action == 'SET':
+        name, placeholder = [part.strip() for part in rest.split('=')]
+        item[name] = values[placeholder]
+    elif action == 'ADD':
+        name, placeholder = rest.split()
+        item[name] = item.get(name, 0) + values[placeholder]
+    else:
+        raise ValueError(f"Unsupported update expression: {expression}")
+    return name
+
+
+def _project(item, projection):
+    if not projection:
+        return dict(item)
+    names = [name.strip() for name in projection.split(',')]
+    return {name: item[name] for name in names if name in item}
+
+
+class LocalTable:
+    """
+    Stand-in for a boto3 DynamoDB Table resource.
+    """
+
+    def __init__(self, dynamodb, name):
+        self.dynamodb = dynamodb
+        self.name = name
+
+    @property
+    def items(self):
+        return self.dynamodb.tables.setdefault(self.name, {})
+
+    def put_item(self, Item):
+        _count(self.dynamodb.calls, 'put_item')
+        self.items[Item['connectionId']] = dict(Item)
+        return {}
+
+    def get_item(self, Key):
+        _count(self.dynamodb.calls, 'get_item')
+        item = self.items.get(Key['connectionId'])
+        return {'Item': dict(item)} if item else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues,
+                    ConditionExpression=None, ReturnValues=None):
+        _count(self.dynamodb.calls, 'update_item')
+        item = self.items.get(Key['connectionId'])
+        if ConditionExpression and not _condition(ConditionExpression, item or {}, ExpressionAttributeValues):
+            raise ConditionalCheckFailedException()
+        if item is None:
+            item = self.items[Key['connectionId']] = {'connectionId': Key['connectionId']}
+        name = _update(item, UpdateExpression, ExpressionAttributeValues)
+        return {'Attributes': {name: item[name]}} if ReturnValues == 'UPDATED_NEW' else {}
+
+    def delete_item(self, Key, ReturnValues=None):
+        _count(self.dynamodb.calls, 'delete_item')
+        item = self.items.pop(Key['connectionId'], None)
+        if item and ReturnValues == 'ALL_OLD':
+            return {'Attributes': item}
+        return {}
+
+    def scan(self, ProjectionExpression=None):
+        _count(self.dynamodb.calls, 'scan')
+        return {'Items': [_project(item, ProjectionExpression) for item in self.items.values()]}
+
+
+class LocalDynamoDB:
+    """
+    Stand-in for both the DynamoDB client and resource APIs, backed by one
+    in-memory store so connect/disconnect writes are seen by scans.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.calls = {}
+
+    def Table(self, name):
+        return LocalTable(self, name)
+
+    def add_connections(self, connection_ids, table_name=CONNECTIONS_TABLE):
+        """
+        Seeds connection records without counting calls.
+        """
+        items = self.tables.setdefault(table_name, {})
+        for connection_id in connection_ids:
+            items[connection_id] = {'connectionId': connection_id}
+
+    def scan(self, TableName, ProjectionExpression=None):
+        _count(self.calls, 'scan')
+        items = self.tables.get(TableName, {}).values()
+        return {'Items': [
+            {name: _to_attribute(value) for name, value in _project(item, ProjectionExpression).items()}
+            for item in items
+        ]}
+
+    def update_item(self, TableName, Key, UpdateExpression, ExpressionAttributeValues,
+                    ConditionExpression=None, ReturnValuesOnConditionCheckFailure=None):
+        _count(self.calls, 'update_item')
+        items = self.tables.setdefault(TableName, {})
+        connection_id = Key['connectionId']['S']
+        values = {name: _from_attribute(value) for name, value in ExpressionAttributeValues.items()}
+        item = items.get(connection_id)
+        if ConditionExpression and not _condition(ConditionExpression, item or {}, values):
+            old = None
+            if item is not None and ReturnValuesOnConditionCheckFailure == 'ALL_OLD':
+                old = {name: _to_attribute(value) for name, value in item.items()}
+            raise ConditionalCheckFailedException(old)
+        if item is None:
+            item = items[connection_id] = {'connectionId': connection_id}
+        _update(item, UpdateExpression, values)
+        return {}
+
+    def delete_item(self, TableName, Key):
+        _count(self.calls, 'delete_item')
+        self.tables.get(TableName, {}).pop(Key['connectionId']['S'], None)
+        return {}
+
+
+class LocalS3:
+    """
+    Stand-in for the S3 client. Objects are kept only if keep_objects is
+    set, so long benchmark runs do not grow memory.
+    """
+
+    def __init__(self, keep_objects=False):
+        self.keep_objects = keep_objects
+        self.objects = {}
+        self.bytes_written = 0
+        self.calls = {}
+
+    def put_object(self, Bucket, Key, Body):
+        _count(self.calls, 'put_object')
+        self.bytes_written += len(Body)
+        if self.keep_objects:
+            self.objects[(Bucket, Key)] = Body
+        return {'ETag': uuid.uuid4().hex}
+
+    def get_object(self, Bucket, Key):
+        _count(self.calls, 'get_object')
+        return {'Body': self.objects[(Bucket, Key)]}
+
+
+class LocalEventBus:
+    """
+    Stand-in for the EventBridge client. Published entries are handed to
+    on_publish if set (used to route events to handlers), otherwise they
+    are collected in `published`.
+    """
+
+    def __init__(self, on_publish=None):
+        self.on_publish = on_publish
+        self.published = []
+        self.calls = {}
+
+    def put_events(self, Entries):
+        _count(self.calls, 'put_events')
+        for entry in Entries:
+            if self.on_publish:
+                self.on_publish(entry)
+            else:
+                self.published.append(entry)
+        return {
+            'FailedEntryCount': 0,
+            'Entries': [{'EventId': uuid.uuid4().hex} for _ in Entries]
+        }
+
+
+class LocalManagementApi:
+    """
+    Stand-in for the API Gateway Management API client.
+
+    Args:
+        latency_ms (float): Time each post_to_connection call takes
+        jitter_ms (float): Uniform random extra latency per call
+        gone_rate (float): Probability that a connection has gone away;
+                           once gone, it stays gone
+        error_rate (float): Probability of a throttling error per call
+        slow_connections (iterable): Connection IDs of slow listeners
+        slow_latency_ms (float): Extra latency per call to a slow listener
+        slow_error_rate (float): Throttling error probability per call to
+                                 a slow listener
+        seed (int): Random seed for reproducible runs
+        on_deliver (callable): Called with (connection_id, data) for every
+                               successful post
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, gone_rate=0.0, error_rate=0.0,
+                 slow_connections=(), slow_latency_ms=0.0, slow_error_rate=0.0,
+                 seed=None, on_deliver=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.gone_rate = gone_rate
+        self.error_rate = error_rate
+        self.slow_connections = set(slow_connections)
+        self.slow_latency_ms = slow_latency_ms
+        self.slow_error_rate = slow_error_rate
+        self.random = random.Random(seed)
+        self.on_deliver = on_deliver
+        self.gone = set()
+        self.delivered = 0
+        self.calls = {}
+
+    def post_to_connection(self, ConnectionId, Data):
+        _count(self.calls, 'post_to_connection')
+        delay = self.latency_ms
+        if self.jitter_ms:
+            delay += self.random.uniform(0, self.jitter_ms)
+        slow = ConnectionId in self.slow_connections
+        if slow:
+            delay += self.slow_latency_ms
+        if delay:
+            time.sleep(delay / 1000.0)
+        if ConnectionId in self.gone or (self.gone_rate and self.random.random() < self.gone_rate):
+            self.gone.add(ConnectionId)
+            raise GoneException()
+        error_rate = self.slow_error_rate if slow else self.error_rate
+        if error_rate and self.random.random() < error_rate:
+            raise LimitExceededException()
+        self.delivered += 1
+        if self.on_deliver:
+            self.on_deliver(ConnectionId, Data)
+        return {}
+
+
+def configure_environment():
+    """
+    Sets the environment variables the functions read at import time.
+    Values already set are kept.
+    """
+    for name, value in ENVIRONMENT.items():
+        os.environ.setdefault(name, value)
+
+
+def load_function(name):
+    """
+    Imports a function's lambda_function.py under a unique module name.
+
+    Every function module is called lambda_function, so they cannot be
+    imported side by side with a plain import.
+
+    Args:
+        name (str): Function directory name (e.g. 'validate_audio')
+
+    Returns:
+        module: The loaded function module
+    """
+    configure_environment()
+    module_name = f"{name}_lambda_function"
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(FUNCTIONS_DIR, name, 'lambda_function.py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def install(dynamodb=None, s3=None, events=None, management_api=None):
+    """
+    Replaces the cached AWS clients with the given stand-ins.
+
+    Args:
+        dynamodb (LocalDynamoDB): Serves both the client and Table APIs
+        s3 (LocalS3): S3 client stand-in
+        events (LocalEventBus): EventBridge client stand-in
+        management_api (LocalManagementApi): Serves ENDPOINT_URL
+    """
+    clients.reset()
+    if dynamodb is not None:
+        clients.set_client('dynamodb', dynamodb)
+        clients.set_table(CONNECTIONS_TABLE, dynamodb.Table(CONNECTIONS_TABLE))
+    if s3 is not None:
+        clients.set_client('s3', s3)
+    if events is not None:
+        clients.set_client('events', events)
+    if management_api is not None:
+        clients.set_client('apigatewaymanagementapi', management_api, endpoint_url=ENDPOINT_URL)
+
+
+def websocket_event(connection_id, body=None, route_key='$default'):
+    """
+    Builds an API Gateway WebSocket event as delivered to the handlers.
+    """
+    event = {
+        'requestContext': {
+            'routeKey': route_key,
+            'connectionId': connection_id,
+            'domainName': DOMAIN_NAME,
+            'stage': STAGE,
+        }
+    }
+    if body is not None:
+        event['body'] = body
+    return event
+
+
+def eventbridge_event(entry):
+    """
+    Converts a put_events entry into the event EventBridge delivers to a
+    target Lambda.
+    """
+    return {
+        'version': '0',
+        'id': uuid.uuid4().hex,
+        'detail-type': entry['DetailType'],
+        'source': entry['Source'],
+        'detail': json.loads(entry['Detail']),
+    }
+
+
+@contextlib.contextmanager
+def quiet_output():
+    """
+    Sends EMF documents and log records to /dev/null while still paying
+    their serialization and formatting cost, as Lambda does.
+    """
+    with open(os.devnull, 'w') as devnull:
+        root = logging.getLogger()
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        root.addHandler(handler)
+        try:
+            with contextlib.redirect_stdout(devnull):
+                yield
+        finally:
+            root.removeHandler(handler)
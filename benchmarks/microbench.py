@@ -0,0 +1,389 @@
+"""
+Offline microbenchmarks for the voice chat hot path.
+
+Runs the audio helpers and handlers against the in-memory stand-ins in
+local_aws.py and reports throughput and latency percentiles across room
+sizes and payload sizes.
+
+Usage:
+    python benchmarks/microbench.py                          # report only
+    python benchmarks/microbench.py --save-baseline benchmarks/baseline.json
+    python benchmarks/microbench.py --baseline benchmarks/baseline.json
+
+With --baseline the run is a regression gate: it exits with status 1 if
+the fastest of --repeat rounds of any case is slower than the baseline's
+typical p50 by more than --tolerance plus the case's own noise.
+Each case is normalized by a fixed calibration workload timed right before
+it, so baselines recorded on one machine can be checked on another and
+CPU frequency drift during a run is factored out.
+
+Calibration does not absorb all noise: short cases (~1 ms) still vary
+between rounds by tens of percent on shared machines. The baseline
+therefore records each case's spread, the relative gap between its
+slowest and fastest rounds, and the gate allows that spread, capped at
+--max-noise, on top of --tolerance. Noisy cases get a wider margin and
+stable ones stay tight. The current run's own spread never widens the
+margin, so a noisy run cannot hide a regression. A case that fails is
+measured again with fresh rounds and only fails the gate if the slowdown
+repeats. Record baselines with at least the default --repeat so the
+spread is representative.
+
+Stand-in behaviour is configurable with --post-latency-ms, --gone-rate and
+--error-rate. No AWS credentials are needed; boto3 must be installed
+(pip install -r functions/process_audio/requirements.txt).
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+import local_aws
+from local_aws import LocalDynamoDB, LocalEventBus, LocalManagementApi, LocalS3, quiet_output
+
+from voice_common.metrics import percentile
+
+ROOM_SIZES = [1, 10, 100, 1000]
+PAYLOAD_SIZES = [2 * 1024, 16 * 1024, 64 * 1024]
+HANDLER_PAYLOAD = 16 * 1024
+
+SOURCE_CONNECTION = 'conn-0'
+
+
+def make_audio(size):
+    """
+    Returns base64 audio of the given decoded size.
+    """
+    return base64.b64encode(os.urandom(size)).decode()
+
+
+def room(size):
+    """
+    Returns connection IDs for a room; the first one is the speaker.
+    """
+    return [f"conn-{i}" for i in range(size)]
+
+
+def processed_event(audio, connection_id=SOURCE_CONNECTION):
+    """
+    Builds the EventBridge event validate_audio receives.
+    """
+    return {
+        'detail-type': 'SendAudioEvent',
+        'source': 'voice-chat',
+        'detail': {
+            'status': 'PROCESSED',
+            'message': {'action': 'sendaudio', 'data': audio, 'author': 'bench'},
+            'websocket_context': {
+                'domain_name': local_aws.DOMAIN_NAME,
+                'stage': local_aws.STAGE,
+                'connection_id': connection_id,
+            },
+            's3_key': 'audio/bench/frame.pcm',
+        }
+    }
+
+
+def pending_event(audio, connection_id=SOURCE_CONNECTION):
+    """
+    Builds the EventBridge event process_audio receives.
+    """
+    event = processed_event(audio, connection_id)
+    event['detail']['status'] = 'PENDING'
+    del event['detail']['s3_key']
+    return event
+
+
+class Case:
+    """
+    One benchmark case.
+
+    Args:
+        name (str): Unique case name, used as the baseline key
+        run (callable): The measured operation
+        setup (callable): Untimed preparation before each run
+        units (int): Work items per run, for throughput (e.g. recipients)
+        unit_name (str): Label of the work items
+    """
+
+    def __init__(self, name, run, setup=None, units=1, unit_name='ops'):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.units = units
+        self.unit_name = unit_name
+
+
+def build_cases(args):
+    """
+    Builds the benchmark cases for the configured stand-ins.
+    """
+    validate_audio = local_aws.load_function('validate_audio')
+    process_audio = local_aws.load_function('process_audio')
+    message = local_aws.load_function('message')
+
+    def management_api():
+        return LocalManagementApi(
+            latency_ms=args.post_latency_ms,
+            gone_rate=args.gone_rate,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        )
+
+    cases = []
+
+    for size in PAYLOAD_SIZES:
+        audio = make_audio(size)
+        cases.append(Case(
+            f"validate_audio_format[payload={size}]",
+            lambda audio=audio: validate_audio.validate_audio_format(audio)))
+        event = pending_event(audio)
+        cases.append(Case(
+            f"get_audio_data[payload={size}]",
+            lambda event=event: process_audio.get_audio_data(event)))
+
+    for room_size in ROOM_SIZES:
+        connections = room(room_size)
+        for size in PAYLOAD_SIZES:
+            audio = make_audio(size)
+
+            def setup():
+                local_aws.install(dynamodb=LocalDynamoDB(), management_api=management_api())
+
+            cases.append(Case(
+                f"broadcast_audio[room={room_size},payload={size}]",
+                lambda connections=connections, audio=audio: validate_audio.broadcast_audio(
+                    connections, audio, 'bench', SOURCE_CONNECTION, local_aws.ENDPOINT_URL),
+                setup=setup, units=room_size, unit_name='recipients'))
+
+        event = processed_event(make_audio(HANDLER_PAYLOAD))
+
+        def setup_validate(connections=connections):
+            dynamodb = LocalDynamoDB()
+            dynamodb.add_connections(connections)
+            local_aws.install(dynamodb=dynamodb, management_api=management_api())
+
+        cases.append(Case(
+            f"validate_audio.handler[room={room_size}]",
+            lambda event=event: validate_audio.lambda_handler(json.loads(json.dumps(event)), None),
+            setup=setup_validate, units=room_size, unit_name='recipients'))
+
+        body = json.dumps({'action': 'sendaudio', 'data': make_audio(HANDLER_PAYLOAD), 'author': 'bench'})
+
+        def setup_message(connections=connections):
+            dynamodb = LocalDynamoDB()
+            dynamodb.add_connections(connections)
+            local_aws.install(dynamodb=dynamodb, events=LocalEventBus(), management_api=management_api())
+
+        cases.append(Case(
+            f"message.handler[sendaudio,room={room_size}]",
+            lambda body=body: message.lambda_handler(local_aws.websocket_event(SOURCE_CONNECTION, body), None),
+            setup=setup_message))
+
+    for size in PAYLOAD_SIZES:
+        event = pending_event(make_audio(size))
+
+        def setup_process():
+            local_aws.install(s3=LocalS3(), events=LocalEventBus())
+
+        cases.append(Case(
+            f"process_audio.handler[payload={size}]",
+            lambda event=event: process_audio.lambda_handler(json.loads(json.dumps(event)), None),
+            setup=setup_process))
+
+    ping = json.dumps({'action': 'ping'})
+
+    def setup_ping():
+        local_aws.install(dynamodb=LocalDynamoDB(), management_api=management_api())
+
+    cases.append(Case(
+        "message.handler[ping]",
+        lambda: message.lambda_handler(local_aws.websocket_event(SOURCE_CONNECTION, ping), None),
+        setup=setup_ping))
+
+    return cases
+
+
+def measure(case, min_time, min_runs, max_runs):
+    """
+    Runs a case until min_time has elapsed and at least min_runs samples
+    are collected.
+
+    Returns:
+        dict: runs, throughput and p50/p95/p99 latency in milliseconds
+    """
+    for _ in range(2):
+        if case.setup:
+            case.setup()
+        case.run()
+
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < min_runs or time.perf_counter() - started < min_time):
+        if case.setup:
+            case.setup()
+        start = time.perf_counter()
+        case.run()
+        samples.append((time.perf_counter() - start) * 1000.0)
+
+    total_seconds = sum(samples) / 1000.0
+    return {
+        'runs': len(samples),
+        'throughput': len(samples) * case.units / total_seconds if total_seconds else 0.0,
+        'unit': case.unit_name,
+        'p50_ms': percentile(samples, 50),
+        'p95_ms': percentile(samples, 95),
+        'p99_ms': percentile(samples, 99),
+    }
+
+
+CALIBRATION_AUDIO = make_audio(HANDLER_PAYLOAD)
+
+
+def calibrate(runs=50):
+    """
+    Times a fixed pure-Python workload similar to the hot path (JSON and
+    base64 of a 16 KB frame). Used to normalize results across machines.
+
+    Returns:
+        float: Median milliseconds of the workload
+    """
+    audio = CALIBRATION_AUDIO
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for i in range(20):
+            payload = json.dumps({'audio': audio, 'author': 'bench', 'seq': i})
+            base64.b64decode(json.loads(payload)['audio'])
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return percentile(samples, 50)
+
+
+def compare(results, baseline, tolerance, max_noise):
+    """
+    Compares the fastest round's normalized p50 of each case against the
+    typical (median round) normalized p50 recorded in the baseline.
+
+    A case regresses if it is slower by more than tolerance plus the
+    spread between rounds recorded in the baseline, capped at max_noise.
+
+    Returns:
+        list: (case, baseline ratio, current ratio, allowed slowdown) for
+              each regression
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline['cases'].get(name)
+        if expected is None:
+            continue
+        allowed = tolerance + min(expected.get('normalized_spread', 0.0), max_noise)
+        current = result['best_normalized_p50']
+        if current > expected['normalized_p50'] * (1.0 + allowed):
+            regressions.append((name, expected['normalized_p50'], current, allowed))
+    return regressions
+
+
+def run_case(case, args):
+    """
+    Measures a case for --repeat rounds, each normalized by a calibration
+    run timed right before it.
+
+    Returns:
+        dict: The typical (median) round, plus the fastest round's
+              normalized p50 and the spread between rounds
+    """
+    rounds = []
+    for _ in range(args.repeat):
+        calibration_ms = calibrate()
+        result = measure(case, args.min_time, args.min_runs, args.max_runs)
+        result['normalized_p50'] = result['p50_ms'] / calibration_ms
+        rounds.append(result)
+    rounds.sort(key=lambda r: r['normalized_p50'])
+    # Report the typical round; gate on the fastest one, since noise
+    # only ever makes a round slower
+    result = rounds[len(rounds) // 2]
+    result['best_normalized_p50'] = rounds[0]['normalized_p50']
+    result['normalized_spread'] = (
+        (rounds[-1]['normalized_p50'] - rounds[0]['normalized_p50']) / result['normalized_p50'])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--filter', help='only run cases whose name contains this text')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per case and round')
+    parser.add_argument('--repeat', type=int, default=5, help='rounds per case')
+    parser.add_argument('--min-runs', type=int, default=10)
+    parser.add_argument('--max-runs', type=int, default=5000)
+    parser.add_argument('--post-latency-ms', type=float, default=0.0, help='post_to_connection latency')
+    parser.add_argument('--gone-rate', type=float, default=0.0, help='GoneException probability per post')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='throttling error probability per post')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--baseline', help='fail if slower than this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.3, help='allowed p50 slowdown (0.3 = 30%%)')
+    parser.add_argument('--max-noise', type=float, default=0.25,
+                        help='cap on the baseline spread added to --tolerance')
+    parser.add_argument('--save-baseline', help='write results to this baseline file')
+    args = parser.parse_args()
+
+    cases = build_cases(args)
+    if args.filter:
+        cases = [case for case in cases if args.filter in case.name]
+
+    results = {}
+    with quiet_output():
+        for case in cases:
+            results[case.name] = run_case(case, args)
+
+    if args.json:
+        print(json.dumps({'cases': results}, indent=2))
+    else:
+        print(f"{'case':<52} {'runs':>6} {'throughput':>22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, result in results.items():
+            throughput = f"{result['throughput']:.0f} {result['unit']}/s"
+            print(
+                f"{name:<52} {result['runs']:>6} {throughput:>22} "
+                f"{result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f}"
+            )
+
+    if args.save_baseline:
+        baseline = {
+            'cases': {
+                name: {
+                    'p50_ms': result['p50_ms'],
+                    'normalized_p50': result['normalized_p50'],
+                    'normalized_spread': result['normalized_spread'],
+                }
+                for name, result in results.items()
+            }
+        }
+        with open(args.save_baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.max_noise)
+        if regressions:
+            # A slowdown only counts if fresh rounds of the case show it again
+            failed = {name for name, _, _, _ in regressions}
+            with quiet_output():
+                retried = {case.name: run_case(case, args) for case in cases if case.name in failed}
+            for name, expected, current, allowed in regressions:
+                print(f"Retrying {name}: {current / expected - 1.0:+.0%} vs baseline "
+                      f"(allowed {allowed:+.0%})", file=sys.stderr)
+            regressions = compare(retried, baseline, args.tolerance, args.max_noise)
+        for name, expected, current, allowed in regressions:
+            print(f"REGRESSION {name}: {current / expected - 1.0:+.0%} vs baseline "
+                  f"(allowed {allowed:+.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} plus case noise (at most {args.max_noise:.0%}) "
+              f"against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
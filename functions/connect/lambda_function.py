@@ -1,41 +1,38 @@
-import json
-import boto3
 import os
-import logging
 from datetime import datetime
+from voice_common.clients import get_table
+from voice_common.logs import get_logger, start_invocation, LazyJson
+from voice_common.profiling import profiled
 
-# Configure logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# Configure logging (level from LOG_LEVEL, sampling from LOG_SAMPLE_RATE)
+logger = get_logger()
 
-dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('CONNECTIONS_TABLE') # Get table name from environment variable
 if not table_name:
     logger.error("DynamoDB connections table name not set in environment variables (CONNECTIONS_TABLE)")
     # Fallback or raise error, depending on desired behavior if env var is missing
     # For now, let's assume it will be set. If not, calls will fail.
-table = None
-if table_name:
-    table = dynamodb.Table(table_name)
 
+@profiled('connect')
 def lambda_handler(event, context):
-    # Log the full event for debugging
-    logger.info(f"Received connect event: {json.dumps(event)}")
+    start_invocation(logger)
+    # Log the redacted event on sampled invocations only
+    logger.debug("Received connect event: %s", LazyJson(event))
     
     connection_id = event.get('requestContext', {}).get('connectionId')
     domain_name = event.get('requestContext', {}).get('domainName')
     stage = event.get('requestContext', {}).get('stage')
     
-    logger.info(f"Connect event for connectionId: {connection_id}")
-    logger.info(f"Domain: {domain_name}, Stage: {stage}")
-    logger.info(f"Using DynamoDB table: {table_name}")
+    logger.debug("Domain: %s, Stage: %s, Table: %s", domain_name, stage, table_name)
 
     if not connection_id:
         logger.error("Connection ID not found in event")
         return {'statusCode': 400, 'body': 'Connection ID not found.'}
 
+    # Created on first use and reused by warm invocations
+    table = get_table(table_name)
     if not table:
-        logger.error(f"DynamoDB table {table_name} not initialized.")
+        logger.error("DynamoDB table %s not initialized.", table_name)
         return {'statusCode': 500, 'body': 'Server configuration error.'}
 
     try:
@@ -47,22 +44,20 @@ def lambda_handler(event, context):
             'stage': stage
         }
         
-        logger.info(f"Storing connection item: {json.dumps(connection_item)}")
-        
         table.put_item(Item=connection_item)
         
         # Verify the connection was stored
         try:
             verification = table.get_item(Key={'connectionId': connection_id})
             if 'Item' in verification:
-                logger.info(f"Successfully verified connection storage: {json.dumps(verification['Item'])}")
+                logger.debug("Verified connection storage: %s", LazyJson(verification['Item']))
             else:
-                logger.warning(f"Connection verification failed - item not found after storage")
+                logger.warning("Connection verification failed - item %s not found after storage", connection_id)
         except Exception as ve:
-            logger.error(f"Error verifying connection storage: {str(ve)}")
+            logger.error("Error verifying connection storage: %s", ve)
         
-        logger.info(f"Connection {connection_id} stored successfully.")
+        logger.info("Connection %s stored", connection_id)
         return {'statusCode': 200, 'body': 'Connected.'}
     except Exception as e:
-        logger.error(f"Error storing connection {connection_id}: {str(e)}")
+        logger.error("Error storing connection %s: %s", connection_id, e)
         return {'statusCode': 500, 'body': f"Failed to connect: {str(e)}"}
\ No newline at end of file
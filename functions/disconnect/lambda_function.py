@@ -1,33 +1,31 @@
-import json
-import boto3
 import os
-import logging
+from voice_common.clients import get_table
+from voice_common.logs import get_logger, start_invocation, LazyJson
+from voice_common.profiling import profiled
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger()
 
-dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('CONNECTIONS_TABLE')
 if not table_name:
     logger.error("DynamoDB connections table name not set in environment variables (CONNECTIONS_TABLE)")
-table = None
-if table_name:
-    table = dynamodb.Table(table_name)
 
+@profiled('disconnect')
 def lambda_handler(event, context):
-    # Log the full event for debugging
-    logger.info(f"Received disconnect event: {json.dumps(event)}")
+    start_invocation(logger)
+    # Log the redacted event on sampled invocations only
+    logger.debug("Received disconnect event: %s", LazyJson(event))
     
     connection_id = event.get('requestContext', {}).get('connectionId')
-    logger.info(f"Disconnect event for connectionId: {connection_id}")
-    logger.info(f"Using DynamoDB table: {table_name}")
+    logger.debug("Using DynamoDB table: %s", table_name)
 
     if not connection_id:
         logger.error("Connection ID not found in event")
         return {'statusCode': 400, 'body': 'Connection ID not found.'}
 
+    # Created on first use and reused by warm invocations
+    table = get_table(table_name)
     if not table:
-        logger.error(f"DynamoDB table {table_name} not initialized.")
+        logger.error("DynamoDB table %s not initialized.", table_name)
         return {'statusCode': 500, 'body': 'Server configuration error.'}
 
     try:
@@ -35,11 +33,11 @@ def lambda_handler(event, context):
         try:
             get_response = table.get_item(Key={'connectionId': connection_id})
             if 'Item' in get_response:
-                logger.info(f"Found existing connection to delete: {json.dumps(get_response['Item'])}")
+                logger.debug("Found existing connection to delete: %s", LazyJson(get_response['Item']))
             else:
-                logger.warning(f"No existing connection found for ID: {connection_id}")
+                logger.warning("No existing connection found for ID: %s", connection_id)
         except Exception as ge:
-            logger.error(f"Error checking existing connection: {str(ge)}")
+            logger.error("Error checking existing connection: %s", ge)
         
         # Delete the connection
         delete_response = table.delete_item(
@@ -51,21 +49,22 @@ def lambda_handler(event, context):
         
         # Log the deleted item if it existed
         if 'Attributes' in delete_response:
-            logger.info(f"Successfully deleted connection: {json.dumps(delete_response['Attributes'])}")
+            logger.info("Connection %s deleted", connection_id)
+            logger.debug("Deleted connection item: %s", LazyJson(delete_response['Attributes']))
         else:
-            logger.warning(f"No connection found to delete for ID: {connection_id}")
+            logger.warning("No connection found to delete for ID: %s", connection_id)
         
         # Verify deletion
         try:
             verification = table.get_item(Key={'connectionId': connection_id})
             if 'Item' not in verification:
-                logger.info(f"Successfully verified connection deletion for {connection_id}")
+                logger.debug("Verified connection deletion for %s", connection_id)
             else:
-                logger.warning(f"Connection still exists after deletion attempt: {json.dumps(verification['Item'])}")
+                logger.warning("Connection still exists after deletion attempt: %s", LazyJson(verification['Item']))
         except Exception as ve:
-            logger.error(f"Error verifying connection deletion: {str(ve)}")
+            logger.error("Error verifying connection deletion: %s", ve)
         
         return {'statusCode': 200, 'body': 'Disconnected.'}
     except Exception as e:
-        logger.error(f"Error deleting connection {connection_id}: {str(e)}")
+        logger.error("Error deleting connection %s: %s", connection_id, e)
         return {'statusCode': 500, 'body': f"Failed to disconnect: {str(e)}"}
\ No newline at end of file
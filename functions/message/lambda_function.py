@@ -1,28 +1,26 @@
 import json
-import boto3
 import os
-import logging
 from datetime import datetime
 from botocore.exceptions import ClientError
+from voice_common.clients import get_client, get_table
+from voice_common.frames import next_sequence, new_frame
+from voice_common.logs import get_logger, start_invocation
+from voice_common.metrics import MetricsLogger, start_trace, mark_stage
+from voice_common.profiling import profiled
 
-# Configure logging for CloudWatch
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# Configure logging for CloudWatch (level from LOG_LEVEL, sampling from LOG_SAMPLE_RATE)
+logger = get_logger()
 
-# Initialize DynamoDB resource for storing WebSocket connections
-# The table stores connection IDs and their metadata
-dynamodb = boto3.resource('dynamodb')
+# DynamoDB table storing WebSocket connection IDs and their metadata.
+# AWS clients are created on first use (see voice_common.clients), so a
+# cold start serving a ping never pays for the DynamoDB resource.
 table_name = os.environ.get('CONNECTIONS_TABLE')
 if not table_name:
     logger.error("CONNECTIONS_TABLE environment variable not set")
 
-table = None
-if table_name:
-    table = dynamodb.Table(table_name)
-
 def get_api_gateway_management_client(event):
     """
-    Creates an API Gateway Management API client for WebSocket communication.
+    Returns the cached API Gateway Management API client for the event's endpoint.
     
     This client is used to send messages back to connected clients through
     their WebSocket connections. The endpoint URL is constructed from the
@@ -41,7 +39,7 @@ def get_api_gateway_management_client(event):
     if not domain_name or not stage:
         return None
     endpoint_url = f"https://{domain_name}/{stage}"
-    return boto3.client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+    return get_client('apigatewaymanagementapi', endpoint_url=endpoint_url)
 
 def send_pong_response(apigw_client, connection_id):
     """
@@ -72,9 +70,10 @@ def send_pong_response(apigw_client, connection_id):
         )
         return True
     except Exception as e:
-        logger.error(f"Pong error: {str(e)}")
+        logger.error("Pong error: %s", e)
         return False
 
+@profiled('message')
 def lambda_handler(event, context):
     """
     Main handler for WebSocket messages in the voice chat system.
@@ -90,8 +89,9 @@ def lambda_handler(event, context):
     
     Flow for audio messages:
     1. Validates connection information and message format
-    2. Retrieves all active connections from DynamoDB
-    3. Sends the audio event to EventBridge for processing
+    2. Takes the speaker's next frame sequence number from DynamoDB
+    3. Starts a frame trace, adds the frame header (speaker, sequence,
+       origin timestamp) and sends the audio event to EventBridge
     4. EventBridge triggers the process_audio Lambda
     
     Args:
@@ -101,6 +101,8 @@ def lambda_handler(event, context):
     Returns:
         dict: Response object with statusCode and body
     """
+    start_invocation(logger)
+    
     # Extract connection information from the WebSocket context
     request_context = event.get('requestContext', {})
     source_connection_id = request_context.get('connectionId')
@@ -112,7 +114,7 @@ def lambda_handler(event, context):
         return {'statusCode': 400, 'body': 'Missing connection information'}
 
     # Ensure DynamoDB table is properly configured
-    if not table:
+    if not table_name:
         return {'statusCode': 500, 'body': 'Server configuration error'}
 
     try:
@@ -123,57 +125,75 @@ def lambda_handler(event, context):
         if not action:
             return {'statusCode': 400, 'body': 'No action specified'}
 
-        # Initialize WebSocket API client for responses
-        apigw_management_client = get_api_gateway_management_client(event)
-        if not apigw_management_client:
-            return {'statusCode': 500, 'body': 'API Gateway client initialization failed'}
-
         # Handle ping/pong for connection health checks
         if action == 'ping':
+            # Initialize WebSocket API client for responses
+            apigw_management_client = get_api_gateway_management_client(event)
+            if not apigw_management_client:
+                return {'statusCode': 500, 'body': 'API Gateway client initialization failed'}
             if send_pong_response(apigw_management_client, source_connection_id):
                 return {'statusCode': 200, 'body': json.dumps({'message': 'Pong sent'})}
             return {'statusCode': 500, 'body': json.dumps({'error': 'Pong failed'})}
 
         # Handle audio message processing
         if action == 'sendaudio':
-            # Retrieve all active WebSocket connections
+            # Start the frame trace; it travels with the event through the pipeline
+            trace = start_trace()
+            metrics = MetricsLogger('message')
+            metrics.set_property('TraceId', trace['trace_id'])
             try:
-                response = table.scan(ProjectionExpression='connectionId')
-                connections = response.get('Items', [])
-            except Exception as e:
-                logger.error(f"DynamoDB error: {str(e)}")
-                return {'statusCode': 500, 'body': 'Database error'}
+                # Number the frame; validate_audio uses it to drop late and reordered frames
+                try:
+                    with metrics.timer('SequenceTime'):
+                        sequence = next_sequence(get_table(table_name), source_connection_id)
+                except ClientError as e:
+                    if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                        # No connection record: disconnected, or $connect failed to store it
+                        logger.warning("Audio from unregistered connection %s", source_connection_id)
+                        return {'statusCode': 410, 'body': json.dumps({'error': 'Not connected'})}
+                    logger.error("DynamoDB error: %s", e)
+                    return {'statusCode': 500, 'body': 'Database error'}
+                except Exception as e:
+                    logger.error("DynamoDB error: %s", e)
+                    return {'statusCode': 500, 'body': 'Database error'}
+                frame = new_frame(source_connection_id, sequence, trace['stages']['ingest'])
 
-            # Prepare WebSocket context for audio processing
-            websocket_context = {
-                'domain_name': domain,
-                'stage': stage,
-                'connection_id': source_connection_id
-            }
-            
-            try:
-                # Send audio event to EventBridge for processing
-                event_response = boto3.client('events').put_events(
-                    Entries=[{
-                        'Source': os.environ.get('EVENT_SOURCE', 'voice-chat'),
-                        'DetailType': 'SendAudioEvent',
-                        'Detail': json.dumps({
-                            'status': 'PENDING',
-                            'message': message_body,
-                            'timestamp': datetime.utcnow().isoformat(),
-                            'websocket_context': websocket_context
-                        }),
-                        'EventBusName': os.environ.get('EVENT_BUS_NAME')
-                    }]
-                )
-                logger.info(f"Audio event sent from {source_connection_id}")
-                return {
-                    'statusCode': 200,
-                    'body': json.dumps({'message': 'Audio event sent'})
+                # Prepare WebSocket context for audio processing
+                websocket_context = {
+                    'domain_name': domain,
+                    'stage': stage,
+                    'connection_id': source_connection_id
                 }
-            except Exception as e:
-                logger.error(f"EventBridge error: {str(e)}")
-                return {'statusCode': 500, 'body': 'Event processing failed'}
+
+                try:
+                    # Send audio event to EventBridge for processing
+                    mark_stage(trace, 'publish')
+                    with metrics.timer('PublishTime'):
+                        event_response = get_client('events').put_events(
+                            Entries=[{
+                                'Source': os.environ.get('EVENT_SOURCE', 'voice-chat'),
+                                'DetailType': 'SendAudioEvent',
+                                'Detail': json.dumps({
+                                    'status': 'PENDING',
+                                    'message': message_body,
+                                    'timestamp': datetime.utcnow().isoformat(),
+                                    'websocket_context': websocket_context,
+                                    'frame': frame,
+                                    'trace': trace
+                                }),
+                                'EventBusName': os.environ.get('EVENT_BUS_NAME')
+                            }]
+                        )
+                    logger.info("Audio event sent from %s (trace: %s)", source_connection_id, trace['trace_id'])
+                    return {
+                        'statusCode': 200,
+                        'body': json.dumps({'message': 'Audio event sent'})
+                    }
+                except Exception as e:
+                    logger.error("EventBridge error: %s", e)
+                    return {'statusCode': 500, 'body': 'Event processing failed'}
+            finally:
+                metrics.flush()
         
         # Return error for unhandled action types
         return {'statusCode': 400, 'body': json.dumps({'error': f'Unhandled action: {action}'})}
@@ -181,5 +201,5 @@ def lambda_handler(event, context):
     except json.JSONDecodeError:
         return {'statusCode': 400, 'body': 'Invalid JSON format'}
     except Exception as e:
-        logger.error(f"Message error: {str(e)}")
+        logger.error("Message error: %s", e)
         return {'statusCode': 500, 'body': 'Message processing failed'}
\ No newline at end of file
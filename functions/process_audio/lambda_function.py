@@ -1,17 +1,17 @@
 import json
-import boto3
 import base64
 import os
 from datetime import datetime
-import logging
+from voice_common.clients import get_client
+from voice_common.logs import get_logger, start_invocation
+from voice_common.metrics import MetricsLogger, get_trace, mark_stage, stage_delta
+from voice_common.profiling import profiled
 
-# Configure logging for CloudWatch
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+# Configure logging for CloudWatch (level from LOG_LEVEL, sampling from LOG_SAMPLE_RATE)
+logger = get_logger()
 
-# Initialize AWS service clients
-s3 = boto3.client('s3')
-eventbridge = boto3.client('events')
+# AWS service clients (S3, EventBridge) are created on first use and
+# cached for the life of the container, see voice_common.clients
 
 def validate_env_vars():
     """
@@ -96,7 +96,7 @@ def get_audio_data(event):
                 'author': body.get('author', 'Anonymous')
             }
         except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in WebSocket message: {str(e)}")
+            logger.error("Invalid JSON in WebSocket message: %s", e)
             return None
     
     if not audio_data.get('audio_data'):
@@ -106,9 +106,10 @@ def get_audio_data(event):
         base64.b64decode(audio_data['audio_data'])
         return audio_data
     except Exception as e:
-        logger.error(f"Invalid base64 audio data: {str(e)}")
+        logger.error("Invalid base64 audio data: %s", e)
         return None
 
+@profiled('process_audio')
 def lambda_handler(event, context):
     """
     Main handler for audio processing in the voice chat system.
@@ -119,6 +120,11 @@ def lambda_handler(event, context):
     3. Processes and stores audio data in S3
     4. Sends processed audio event to EventBridge for broadcasting
     
+    The frame trace started by the message Lambda is stamped with the
+    'process' and 'forward' stages and carried on to validate_audio, along
+    with the frame header (speaker, sequence, origin timestamp).
+    Ingest-to-process latency and S3 PUT time are emitted as EMF metrics.
+    
     The function handles both direct WebSocket events and EventBridge events,
     maintaining the WebSocket context throughout the processing pipeline.
     
@@ -135,6 +141,13 @@ def lambda_handler(event, context):
     Returns:
         dict: Response object with statusCode and body
     """
+    start_invocation(logger)
+    trace = get_trace(event.get('detail', {}))
+    mark_stage(trace, 'process')
+    metrics = MetricsLogger('process_audio')
+    metrics.set_property('TraceId', trace['trace_id'])
+    metrics.put_metric('IngestToProcess', stage_delta(trace, 'ingest', 'process'))
+    
     try:
         validate_env_vars()
         
@@ -158,20 +171,22 @@ def lambda_handler(event, context):
         s3_key = f"audio/{audio_info['author']}/{timestamp}.pcm"
         
         try:
-            s3.put_object(
-                Bucket=os.environ['AUDIO_BUCKET'],
-                Key=s3_key,
-                Body=base64.b64decode(audio_info['audio_data'])
-            )
-            logger.info(f"Audio stored: {s3_key}")
+            with metrics.timer('S3PutTime'):
+                get_client('s3').put_object(
+                    Bucket=os.environ['AUDIO_BUCKET'],
+                    Key=s3_key,
+                    Body=base64.b64decode(audio_info['audio_data'])
+                )
+            logger.debug("Audio stored: %s", s3_key)
         except Exception as e:
-            logger.error(f"S3 storage error: {str(e)}")
+            logger.error("S3 storage error: %s", e)
             return {
                 'statusCode': 500,
                 'body': json.dumps({'error': 'Error storing audio'})
             }
         
         try:
+            mark_stage(trace, 'forward')
             event_detail = {
                 'status': 'PROCESSED',
                 'message': {
@@ -181,8 +196,11 @@ def lambda_handler(event, context):
                 },
                 'websocket_context': ws_context,
                 's3_key': s3_key,
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': datetime.utcnow().isoformat(),
+                'trace': trace
             }
+            if 'frame' in event.get('detail', {}):
+                event_detail['frame'] = event['detail']['frame']
             
             event_entry = {
                 'Source': os.environ.get('EVENT_SOURCE', 'voice-chat'),
@@ -191,8 +209,9 @@ def lambda_handler(event, context):
                 'EventBusName': os.environ.get('EVENT_BUS_NAME')
             }
             
-            eventbridge.put_events(Entries=[event_entry])
-            logger.info(f"Audio validation event sent for {s3_key}")
+            with metrics.timer('PublishTime'):
+                get_client('events').put_events(Entries=[event_entry])
+            logger.info("Audio validation event sent for %s (trace: %s)", s3_key, trace['trace_id'])
             
             return {
                 'statusCode': 200,
@@ -202,15 +221,17 @@ def lambda_handler(event, context):
                 })
             }
         except Exception as e:
-            logger.error(f"EventBridge error: {str(e)}")
+            logger.error("EventBridge error: %s", e)
             return {
                 'statusCode': 500,
                 'body': json.dumps({'error': 'Error sending validation event'})
             }
             
     except Exception as e:
-        logger.error(f"Process audio error: {str(e)}")
+        logger.error("Process audio error: %s", e)
         return {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
-        } 
\ No newline at end of file
+        }
+    finally:
+        metrics.flush()
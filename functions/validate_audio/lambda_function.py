@@ -1,23 +1,35 @@
 import json
 import base64
 import os
-import boto3
 import logging
+import time
 from datetime import datetime
+from botocore.exceptions import ClientError
+from voice_common.clients import get_client
+from voice_common.consumers import ConsumerHealth, CONSUMER_HEALTH_PERSIST
+from voice_common.frames import FrameOrder, FRAME_ORDER_PERSIST, DROP_EXPIRED, DROP_OUT_OF_ORDER, get_frame, frame_age_ms
+from voice_common.logs import get_logger, start_invocation, InvocationSummary, LazyJson
+from voice_common.metrics import MetricsLogger, get_trace, mark_stage, stage_delta, percentile, now_ms
+from voice_common.profiling import profiled
 
-# Configure logging for CloudWatch
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# Configure logging for CloudWatch (level from LOG_LEVEL, sampling from LOG_SAMPLE_RATE)
+logger = get_logger()
 
-# Initialize AWS service clients
-dynamodb = boto3.client('dynamodb')
-apigatewaymanagementapi = None
+# AWS service clients are created on first use and cached for the life of
+# the container, see voice_common.clients
+
+# Per-listener send health, kept across warm invocations so slow listeners
+# are recognised from frame to frame (see voice_common.consumers)
+consumer_health = ConsumerHealth()
+
+# Highest frame sequence broadcast per speaker (see voice_common.frames)
+frame_order = FrameOrder()
 
 def get_api_client(endpoint_url):
     """
     Creates or retrieves a cached API Gateway Management API client.
     
-    This function maintains a single client instance for the WebSocket API
+    This function maintains one client instance per WebSocket API endpoint
     to optimize performance and resource usage. The client is used to send
     messages back to connected clients through their WebSocket connections.
     
@@ -31,19 +43,71 @@ def get_api_client(endpoint_url):
     Raises:
         Exception: If client creation fails
     """
-    global apigatewaymanagementapi
-    if apigatewaymanagementapi is None:
-        try:
-            apigatewaymanagementapi = boto3.client(
-                'apigatewaymanagementapi',
-                endpoint_url=endpoint_url
-            )
-        except Exception as e:
-            logger.error(f"API Gateway client error: {str(e)}")
-            raise
-    return apigatewaymanagementapi
+    try:
+        return get_client('apigatewaymanagementapi', endpoint_url=endpoint_url)
+    except Exception as e:
+        logger.error("API Gateway client error: %s", e)
+        raise
 
-def broadcast_audio(connections, audio_data, author, connection_id, endpoint_url):
+def persist_backoff(conn, backoff_until):
+    """
+    Stores a listener's backoff deadline on its connection record so other
+    containers skip it too.
+    
+    The update is conditional on the record existing, so it never
+    recreates a connection that disconnected in the meantime.
+    
+    Args:
+        conn (str): Listener connection ID
+        backoff_until (float): Backoff deadline in epoch milliseconds
+    """
+    try:
+        get_client('dynamodb').update_item(
+            TableName=os.environ['CONNECTIONS_TABLE'],
+            Key={'connectionId': {'S': conn}},
+            UpdateExpression='SET backoffUntil = :until',
+            ConditionExpression='attribute_exists(connectionId)',
+            ExpressionAttributeValues={':until': {'N': str(int(backoff_until))}}
+        )
+    except Exception as e:
+        logger.debug("Could not persist backoff for %s: %s", conn, e)
+
+def claim_sequence(frame):
+    """
+    Records the frame's sequence on the speaker's connection record unless
+    a newer frame of the speaker was already broadcast by any container.
+    
+    Args:
+        frame (dict): Frame header from voice_common.frames.get_frame
+    
+    Returns:
+        bool: False if a newer frame was already broadcast. Frames of a
+              speaker whose record is gone are let through, and so are
+              all frames if the claim itself fails.
+    """
+    try:
+        get_client('dynamodb').update_item(
+            TableName=os.environ['CONNECTIONS_TABLE'],
+            Key={'connectionId': {'S': frame['speaker']}},
+            UpdateExpression='SET lastSentSeq = :seq',
+            ConditionExpression='attribute_exists(connectionId) AND '
+                                '(attribute_not_exists(lastSentSeq) OR lastSentSeq < :seq)',
+            ExpressionAttributeValues={':seq': {'N': str(frame['sequence'])}},
+            # Needs botocore >= 1.29.164, pinned in requirements.txt
+            ReturnValuesOnConditionCheckFailure='ALL_OLD'
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            # No item means the speaker disconnected, not that the frame is late
+            return not e.response.get('Item')
+        logger.warning("Could not claim frame sequence for %s: %s", frame['speaker'], e)
+        return True
+    except Exception as e:
+        logger.warning("Could not claim frame sequence for %s: %s", frame['speaker'], e)
+        return True
+
+def broadcast_audio(connections, audio_data, author, connection_id, endpoint_url, metrics=None, frame=None):
     """
     Broadcasts audio data to all connected clients except the sender.
     
@@ -53,9 +117,11 @@ def broadcast_audio(connections, audio_data, author, connection_id, endpoint_url
     
     The broadcast process:
     1. Prepares the audio message with metadata
-    2. Attempts to send to each connection
-    3. Handles failed sends and cleans up stale connections
-    4. Tracks broadcast statistics
+    2. Orders listeners healthy-first and skips frames for slow listeners
+       (degraded frame rate) or listeners in error backoff
+    3. Attempts to send to each remaining connection
+    4. Handles failed sends and cleans up stale connections
+    5. Tracks broadcast statistics and logs them as a single summary record
     
     Args:
         connections (list): List of connection IDs to broadcast to
@@ -63,6 +129,11 @@ def broadcast_audio(connections, audio_data, author, connection_id, endpoint_url
         author (str): Identifier of the audio source client
         connection_id (str): WebSocket connection ID of the sender
         endpoint_url (str): WebSocket API endpoint URL
+        metrics (MetricsLogger): Optional logger receiving per-recipient send
+                                 times (successful and failed posts) and
+                                 fan-out p50/p99 over all posts
+        frame (dict): Optional frame header; its sequence and origin
+                      timestamp are sent along so clients can order playout
     
     Returns:
         tuple: (message_sent, successful_broadcasts, failed_broadcasts, deleted_connections)
@@ -77,11 +148,18 @@ def broadcast_audio(connections, audio_data, author, connection_id, endpoint_url
             'timestamp': datetime.utcnow().isoformat()
         }
     }
+    if frame is not None:
+        message['data']['sequence'] = frame['sequence']
+        message['data']['origin_timestamp'] = frame['origin_ts']
     
     message_json = json.dumps(message)
     successful_broadcasts = 0
     failed_broadcasts = 0
     deleted_connections = 0
+    skipped_frames = 0
+    send_times = []
+    failed_send_times = []
+    summary = InvocationSummary(logger, 'broadcast')
     
     is_echo_mode = os.environ.get('ECHO_MODE', 'false').lower() == 'true'
     single_connection = len(connections) == 1 and connections[0] == connection_id
@@ -89,49 +167,84 @@ def broadcast_audio(connections, audio_data, author, connection_id, endpoint_url
     # If there's only one connection and it's the sender, force echo mode
     if single_connection:
         is_echo_mode = True
-        logger.info("Single connection detected, forcing echo mode")
     
-    logger.info(f"Broadcasting to {len(connections)} connections (Echo mode: {is_echo_mode})")
-    logger.info(f"Source connection: {connection_id}")
-    
-    for conn in connections:
-        logger.info(f"Processing connection: {conn}")
-        
+    # No per-recipient logging here: the loop runs once per listener per frame
+    now = now_ms()
+    # Healthy listeners are untracked, so their per-frame cost is one lookup
+    tracked = consumer_health.connections
+    lagging_ms = consumer_health.lagging_ms
+    for conn in consumer_health.order(connections):
         # Check if we should broadcast to this connection
         should_broadcast = is_echo_mode or conn != connection_id
         if not should_broadcast:
-            logger.info(f"Skipping source connection {conn}")
             continue
+        
+        if conn in tracked:
+            skip_reason = consumer_health.admit(conn, now)
+            if skip_reason:
+                skipped_frames += 1
+                summary.incr(f"skipped_{skip_reason}")
+                continue
             
+        send_start = time.perf_counter()
         try:
             api_client.post_to_connection(
                 Data=message_json,
                 ConnectionId=conn
             )
+            send_time = (time.perf_counter() - send_start) * 1000.0
+            send_times.append(send_time)
+            if conn in tracked or send_time > lagging_ms:
+                consumer_health.record_success(conn, send_time, now)
             successful_broadcasts += 1
-            logger.info(f"Successfully sent to {conn}")
         except Exception as e:
+            failed_send_times.append((time.perf_counter() - send_start) * 1000.0)
             error_msg = str(e)
             if "GoneException" in error_msg:
+                consumer_health.forget(conn)
                 try:
-                    dynamodb.delete_item(
+                    get_client('dynamodb').delete_item(
                         TableName=os.environ['CONNECTIONS_TABLE'],
                         Key={'connectionId': {'S': conn}}
                     )
                     deleted_connections += 1
-                    logger.info(f"Deleted stale connection: {conn}")
                 except Exception as del_err:
-                    logger.error(f"Connection deletion error: {str(del_err)}")
+                    summary.error('delete', f"{conn}: {del_err}")
             else:
                 failed_broadcasts += 1
-                logger.error(f"Broadcast error for {conn}: {error_msg}")
+                summary.error('send', f"{conn}: {error_msg}")
+                backoff_until = consumer_health.record_error(conn, now_ms())
+                if backoff_until is not None:
+                    summary.incr('backoff_started')
+                    if CONSUMER_HEALTH_PERSIST:
+                        persist_backoff(conn, backoff_until)
+    
+    # The room's typical post time sets the lagging threshold for the next frame
+    if send_times:
+        consumer_health.observe_room(percentile(send_times, 50))
+    
+    if metrics is not None:
+        for send_time in send_times:
+            metrics.put_metric('SendTime', send_time)
+        for send_time in failed_send_times:
+            metrics.put_metric('FailedSendTime', send_time)
+        # Percentiles cover every post, so slow throttled calls and timeouts
+        # show up in the tail
+        all_send_times = send_times + failed_send_times
+        metrics.put_metric('FanoutP50', percentile(all_send_times, 50))
+        metrics.put_metric('FanoutP99', percentile(all_send_times, 99))
+        metrics.put_metric('FanoutRecipients', len(send_times), unit='Count')
+        metrics.put_metric('SkippedFrames', skipped_frames, unit='Count')
     
     # Log final statistics
-    logger.info(
-        f"Broadcast complete - Total: {len(connections)}, "
-        f"Success: {successful_broadcasts}, Failed: {failed_broadcasts}, "
-        f"Deleted: {deleted_connections}, Echo mode: {is_echo_mode}"
-    )
+    summary.set('source', connection_id)
+    summary.set('total', len(connections))
+    summary.set('successful', successful_broadcasts)
+    summary.set('failed', failed_broadcasts)
+    summary.set('deleted', deleted_connections)
+    summary.set('skipped', skipped_frames)
+    summary.set('echo_mode', is_echo_mode)
+    summary.emit(logging.WARNING if failed_broadcasts else logging.INFO)
     return message, successful_broadcasts, failed_broadcasts, deleted_connections
 
 def validate_audio_format(audio_data):
@@ -161,6 +274,7 @@ def validate_audio_format(audio_data):
     except Exception as e:
         return False, f"Invalid audio data: {str(e)}"
 
+@profiled('validate_audio')
 def lambda_handler(event, context):
     """
     Main handler for audio validation and broadcasting.
@@ -170,11 +284,18 @@ def lambda_handler(event, context):
     clients through their WebSocket connections.
     
     Flow:
-    1. Retrieves active connections from DynamoDB
-    2. Validates event structure and required fields
-    3. Validates audio format
-    4. Broadcasts valid audio to all connected clients
-    5. Handles connection cleanup and error cases
+    1. Drops the frame if it is past its playout deadline or a newer frame
+       of the same speaker was already broadcast
+    2. Retrieves active connections from DynamoDB
+    3. Validates event structure and required fields
+    4. Validates audio format
+    5. Broadcasts valid audio to all connected clients
+    6. Handles connection cleanup and error cases
+    
+    The frame trace is stamped with the 'broadcast' stage on arrival and
+    'delivered' once fan-out finishes. Scan time, process-to-broadcast
+    latency, end-to-end latency, fan-out statistics, frame age and dropped
+    frames are emitted as EMF metrics.
     
     Args:
         event (dict): EventBridge event containing processed audio data
@@ -183,29 +304,53 @@ def lambda_handler(event, context):
     Returns:
         dict: Response object with statusCode and body containing broadcast results
     """
+    start_invocation(logger)
+    trace = get_trace(event.get('detail'))
+    mark_stage(trace, 'broadcast')
+    metrics = MetricsLogger('validate_audio')
+    metrics.set_property('TraceId', trace['trace_id'])
+    metrics.put_metric('ProcessToBroadcast', stage_delta(trace, 'process', 'broadcast'))
+    
     try:
         connections_table = os.environ.get('CONNECTIONS_TABLE')
-        logger.info(f"Using connections table: {connections_table}")
+        
+        # Drop late and reordered frames before paying for the scan and fan-out
+        frame = get_frame(event.get('detail'))
+        if frame is not None:
+            now = now_ms()
+            metrics.put_metric('FrameAge', frame_age_ms(frame, now))
+            drop_reason = frame_order.check_frame(frame, now)
+            if drop_reason is None and FRAME_ORDER_PERSIST and not claim_sequence(frame):
+                drop_reason = DROP_OUT_OF_ORDER
+            if drop_reason:
+                metrics.put_metric('ExpiredFrames' if drop_reason == DROP_EXPIRED else 'OutOfOrderFrames', 1, unit='Count')
+                logger.info("Dropped %s frame %d from %s", drop_reason, frame['sequence'], frame['speaker'])
+                return {
+                    'statusCode': 200,
+                    'body': json.dumps({'message': 'Frame dropped', 'reason': drop_reason})
+                }
         
         try:
-            # Scan for active connections
-            response = dynamodb.scan(
-                TableName=connections_table,
-                ProjectionExpression='connectionId'
-            )
+            # Scan for active connections (and their persisted backoff, if enabled)
+            with metrics.timer('ScanTime'):
+                response = get_client('dynamodb').scan(
+                    TableName=connections_table,
+                    ProjectionExpression='connectionId, backoffUntil' if CONSUMER_HEALTH_PERSIST else 'connectionId'
+                )
             
             # Extract and validate connection IDs
             connections = []
+            scanned_at = now_ms()
             for item in response.get('Items', []):
                 conn_id = item.get('connectionId', {}).get('S')
                 if conn_id:
                     connections.append(conn_id)
+                    if 'backoffUntil' in item:
+                        consumer_health.seed(conn_id, float(item['backoffUntil']['N']), scanned_at)
                 else:
-                    logger.warning(f"Invalid connection item format: {item}")
+                    logger.warning("Invalid connection item format: %s", LazyJson(item))
             
-            logger.info(f"Found {len(connections)} active connections")
-            if connections:
-                logger.info(f"Connection IDs: {connections}")
+            logger.debug("Found %d active connections: %s", len(connections), LazyJson(connections))
             
             if not connections:
                 return {
@@ -214,7 +359,7 @@ def lambda_handler(event, context):
                 }
             
         except Exception as e:
-            logger.error(f"DynamoDB scan error: {str(e)}")
+            logger.error("DynamoDB scan error: %s", e)
             return {
                 'statusCode': 500,
                 'body': json.dumps({'error': 'Database error'})
@@ -222,7 +367,7 @@ def lambda_handler(event, context):
         
         # Validate event structure
         if not isinstance(event.get('detail'), dict):
-            logger.error(f"Invalid event structure: {event}")
+            logger.error("Invalid event structure: %s", LazyJson(event))
             return {
                 'statusCode': 400,
                 'body': json.dumps({'error': 'Invalid event structure'})
@@ -232,9 +377,8 @@ def lambda_handler(event, context):
         message = detail.get('message', {})
         websocket_context = detail.get('websocket_context', {})
         
-        # Log incoming event details
-        logger.info(f"Event detail: {json.dumps(detail)}")
-        logger.info(f"WebSocket context: {json.dumps(websocket_context)}")
+        # Log incoming event details (audio redacted) on sampled invocations only
+        logger.debug("Event detail: %s", LazyJson(detail))
         
         required_fields = {
             'status': detail.get('status'),
@@ -247,7 +391,7 @@ def lambda_handler(event, context):
         
         missing_fields = [field for field, value in required_fields.items() if not value]
         if missing_fields:
-            logger.error(f"Missing required fields: {missing_fields}")
+            logger.error("Missing required fields: %s", missing_fields)
             return {
                 'statusCode': 400,
                 'body': json.dumps({'error': f"Missing fields: {', '.join(missing_fields)}"})
@@ -259,12 +403,11 @@ def lambda_handler(event, context):
         connection_id = required_fields['connection_id']
         endpoint_url = f"https://{required_fields['domain_name']}/{required_fields['stage']}"
         
-        logger.info(f"Processing audio from {author} (connection: {connection_id})")
-        logger.info(f"Using endpoint URL: {endpoint_url}")
+        logger.debug("Processing audio from %s (connection: %s, endpoint: %s)", author, connection_id, endpoint_url)
         
         is_valid, validation_message = validate_audio_format(audio_data)
         if not is_valid:
-            logger.error(f"Audio validation failed: {validation_message}")
+            logger.error("Audio validation failed: %s", validation_message)
             return {
                 'statusCode': 400,
                 'body': json.dumps({'error': validation_message})
@@ -276,8 +419,12 @@ def lambda_handler(event, context):
                 audio_data, 
                 author, 
                 connection_id, 
-                endpoint_url
+                endpoint_url,
+                metrics,
+                frame
             )
+            mark_stage(trace, 'delivered')
+            metrics.put_metric('IngestToDelivered', stage_delta(trace, 'ingest', 'delivered'))
             
             return {
                 'statusCode': 200,
@@ -292,15 +439,17 @@ def lambda_handler(event, context):
                 })
             }
         except Exception as e:
-            logger.error(f"Broadcast error: {str(e)}")
+            logger.error("Broadcast error: %s", e)
             return {
                 'statusCode': 500,
                 'body': json.dumps({'error': 'Broadcast failed'})
             }
         
     except Exception as e:
-        logger.error(f"Validation error: {str(e)}")
+        logger.error("Validation error: %s", e)
         return {
             'statusCode': 500,
             'body': json.dumps({'error': str(e)})
-        } 
\ No newline at end of file
+        }
+    finally:
+        metrics.flush()
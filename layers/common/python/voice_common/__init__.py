@@ -0,0 +1,10 @@
+"""
+Shared helpers for the voice chat Lambda functions.
+
+This package is deployed as a Lambda layer and is available to every
+function under /opt/python. Modules are imported during the Lambda init
+phase of every cold start, so they only import what every handler path
+needs. boto3 is imported there on purpose (see voice_common.clients);
+the clients themselves are built on first use, so a path pays only for
+the clients it calls.
+"""
@@ -0,0 +1,93 @@
+"""
+Lazy, memoized AWS client construction.
+
+Creating boto3 clients and resources loads and parses service models.
+Constructing them at module load makes every cold start pay for every
+client, including paths that never use them (a 'ping' never touches
+DynamoDB). The helpers here build each client on first use and keep it
+for the life of the container.
+
+boto3 itself is imported at module scope: every handler path needs it,
+so deferring the import would only move its cost out of the Lambda init
+phase (which runs with boosted CPU and can be pre-warmed) into the first
+request.
+"""
+import boto3
+
+_clients = {}
+_tables = {}
+_dynamodb_resource = None
+
+
+def get_client(service_name, endpoint_url=None):
+    """
+    Returns a cached boto3 client, creating it on first use.
+
+    Clients are keyed by service and endpoint, so API Gateway Management
+    API clients for different WebSocket endpoints are kept apart.
+
+    Args:
+        service_name (str): boto3 service name (e.g. 's3', 'events')
+        endpoint_url (str): Optional endpoint override
+
+    Returns:
+        boto3.client: The cached client
+    """
+    key = (service_name, endpoint_url)
+    client = _clients.get(key)
+    if client is None:
+        if endpoint_url:
+            client = boto3.client(service_name, endpoint_url=endpoint_url)
+        else:
+            client = boto3.client(service_name)
+        _clients[key] = client
+    return client
+
+
+def get_table(table_name):
+    """
+    Returns a cached DynamoDB Table resource, creating it on first use.
+
+    Args:
+        table_name (str): DynamoDB table name
+
+    Returns:
+        dynamodb.Table: The cached table resource, or None if table_name
+                        is empty
+    """
+    global _dynamodb_resource
+    if not table_name:
+        return None
+    table = _tables.get(table_name)
+    if table is None:
+        if _dynamodb_resource is None:
+            _dynamodb_resource = boto3.resource('dynamodb')
+        table = _dynamodb_resource.Table(table_name)
+        _tables[table_name] = table
+    return table
+
+
+def set_client(service_name, client, endpoint_url=None):
+    """
+    Installs a client in the cache in place of a boto3 client. Used by the
+    local benchmarks to run the handlers against in-memory stand-ins.
+    """
+    _clients[(service_name, endpoint_url)] = client
+
+
+def set_table(table_name, table):
+    """
+    Installs a DynamoDB Table stand-in in the cache, see set_client().
+    """
+    _tables[table_name] = table
+
+
+def reset():
+    """
+    Drops all cached clients. Used by local benchmarks to measure
+    construction cost or install stand-ins.
+    """
+    global _dynamodb_resource
+    _clients.clear()
+    _tables.clear()
+    _dynamodb_resource = None
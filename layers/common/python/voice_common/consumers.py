@@ -0,0 +1,205 @@
+"""
+Slow-consumer detection for audio fan-out.
+
+broadcast_audio posts to every listener in turn, so one listener on a bad
+link delays everyone after it in the loop. ConsumerHealth keeps per-
+connection health in warm container memory and tells the broadcast loop
+which listeners to send to, in which order:
+
+- Listeners lagging behind the room are sent to after the rest, slowest
+  and erroring ones last, so a slow listener only delays listeners slower
+  than itself. A post is lagging when it takes longer than
+  SLOW_CONSUMER_LAGGING_RATIO times the room's smoothed median post time,
+  and at least SLOW_CONSUMER_LAGGING_MS.
+- A listener whose smoothed post latency exceeds SLOW_CONSUMER_LATENCY_MS
+  is degraded: it only gets every DEGRADED_FRAME_INTERVAL-th frame until
+  its latency recovers.
+- A listener failing SLOW_CONSUMER_ERROR_STREAK posts in a row (e.g.
+  throttling) is skipped for a backoff that starts at
+  SLOW_CONSUMER_BACKOFF_MS and doubles with every further failure, up to
+  SLOW_CONSUMER_MAX_BACKOFF_MS. After the backoff one frame is sent as a
+  probe; a success clears the streak.
+
+With CONSUMER_HEALTH_PERSIST=true the backoff deadline is also stored on
+the connection record, so other containers pick it up from their scan.
+"""
+import os
+
+SLOW_CONSUMER_LATENCY_MS = float(os.environ.get('SLOW_CONSUMER_LATENCY_MS', '150'))
+SLOW_CONSUMER_LAGGING_MS = float(os.environ.get('SLOW_CONSUMER_LAGGING_MS', '5'))
+SLOW_CONSUMER_LAGGING_RATIO = float(os.environ.get('SLOW_CONSUMER_LAGGING_RATIO', '2'))
+SLOW_CONSUMER_ERROR_STREAK = int(os.environ.get('SLOW_CONSUMER_ERROR_STREAK', '3'))
+DEGRADED_FRAME_INTERVAL = int(os.environ.get('DEGRADED_FRAME_INTERVAL', '2'))
+SLOW_CONSUMER_BACKOFF_MS = float(os.environ.get('SLOW_CONSUMER_BACKOFF_MS', '500'))
+SLOW_CONSUMER_MAX_BACKOFF_MS = float(os.environ.get('SLOW_CONSUMER_MAX_BACKOFF_MS', '10000'))
+CONSUMER_HEALTH_PERSIST = os.environ.get('CONSUMER_HEALTH_PERSIST', 'false').lower() == 'true'
+
+# Weight of the newest sample in the smoothed latencies
+LATENCY_SMOOTHING = 0.3
+
+# Most connections tracked per container; the least recently seen half is
+# dropped when exceeded
+MAX_TRACKED_CONNECTIONS = 10000
+
+# Reasons returned by ConsumerHealth.admit() for skipped frames
+SKIP_BACKOFF = 'backoff'
+SKIP_DEGRADED = 'degraded'
+
+
+class ConsumerHealth:
+    """
+    Per-connection send health kept across warm invocations.
+
+    Only lagging or failing listeners are tracked, so healthy listeners
+    cost a single dict lookup per frame. State per connection: smoothed
+    latency, consecutive error count, backoff deadline (epoch ms), frames
+    offered while degraded and the time it was last seen. A listener is
+    dropped again once it keeps up with the room and is error free.
+
+    `lagging_ms` is the current lagging threshold: posts slower than it
+    start tracking a listener.
+    """
+
+    def __init__(self,
+                 slow_latency_ms=SLOW_CONSUMER_LATENCY_MS,
+                 error_streak=SLOW_CONSUMER_ERROR_STREAK,
+                 degraded_interval=DEGRADED_FRAME_INTERVAL,
+                 backoff_ms=SLOW_CONSUMER_BACKOFF_MS,
+                 max_backoff_ms=SLOW_CONSUMER_MAX_BACKOFF_MS,
+                 lagging_ms=SLOW_CONSUMER_LAGGING_MS,
+                 lagging_ratio=SLOW_CONSUMER_LAGGING_RATIO):
+        self.slow_latency_ms = slow_latency_ms
+        self.error_streak = error_streak
+        self.degraded_interval = max(1, degraded_interval)
+        self.backoff_ms = backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self.min_lagging_ms = lagging_ms
+        self.lagging_ratio = lagging_ratio
+        self.lagging_ms = lagging_ms
+        self.room_ms = None
+        self.connections = {}
+
+    def _state(self, connection_id, now):
+        state = self.connections.get(connection_id)
+        if state is None:
+            if len(self.connections) >= MAX_TRACKED_CONNECTIONS:
+                self._prune()
+            state = self.connections[connection_id] = {
+                'latency_ms': 0.0,
+                'streak': 0,
+                'backoff_until': 0.0,
+                'frames': 0,
+                'seen': now,
+            }
+        state['seen'] = now
+        return state
+
+    def _prune(self):
+        by_age = sorted(self.connections, key=lambda conn: self.connections[conn]['seen'])
+        for connection_id in by_age[:len(by_age) // 2]:
+            del self.connections[connection_id]
+
+    def order(self, connections):
+        """
+        Returns connections with untracked (healthy) listeners first in
+        their original order, then tracked ones by smoothed latency and
+        listeners with recent errors last.
+        """
+        tracked = self.connections
+        if not tracked:
+            return connections
+        healthy = [conn for conn in connections if conn not in tracked]
+        if len(healthy) == len(connections):
+            return connections
+        lagging = [conn for conn in connections if conn in tracked]
+        lagging.sort(key=lambda conn: (tracked[conn]['streak'] > 0, tracked[conn]['latency_ms']))
+        return healthy + lagging
+
+    def admit(self, connection_id, now):
+        """
+        Decides whether the current frame is sent to a connection.
+
+        Args:
+            connection_id (str): Listener connection ID
+            now (float): Current epoch milliseconds
+
+        Returns:
+            str: None to send, otherwise the skip reason (SKIP_BACKOFF or
+                 SKIP_DEGRADED)
+        """
+        state = self.connections.get(connection_id)
+        if state is None:
+            return None
+        state['seen'] = now
+        if state['backoff_until'] > now:
+            return SKIP_BACKOFF
+        if state['latency_ms'] > self.slow_latency_ms:
+            state['frames'] += 1
+            if state['frames'] % self.degraded_interval:
+                return SKIP_DEGRADED
+        return None
+
+    def observe_room(self, median_ms):
+        """
+        Updates the room's smoothed median post time and the lagging
+        threshold derived from it.
+
+        Args:
+            median_ms (float): Median post latency of the last frame
+        """
+        if self.room_ms is None:
+            self.room_ms = median_ms
+        else:
+            self.room_ms += LATENCY_SMOOTHING * (median_ms - self.room_ms)
+        self.lagging_ms = max(self.min_lagging_ms, self.lagging_ratio * self.room_ms)
+
+    def record_success(self, connection_id, latency_ms, now):
+        """
+        Records a successful post and its latency.
+        """
+        state = self.connections.get(connection_id)
+        if state is None:
+            if latency_ms <= self.lagging_ms:
+                return
+            state = self._state(connection_id, now)
+            state['latency_ms'] = latency_ms
+            return
+        state['seen'] = now
+        state['latency_ms'] += LATENCY_SMOOTHING * (latency_ms - state['latency_ms'])
+        state['streak'] = 0
+        state['backoff_until'] = 0.0
+        if state['latency_ms'] <= self.lagging_ms:
+            del self.connections[connection_id]
+
+    def record_error(self, connection_id, now):
+        """
+        Records a failed post (other than GoneException).
+
+        Returns:
+            float: The new backoff deadline in epoch ms if the connection
+                   entered backoff, otherwise None
+        """
+        state = self._state(connection_id, now)
+        state['streak'] += 1
+        if state['streak'] < self.error_streak:
+            return None
+        exponent = state['streak'] - self.error_streak
+        backoff = min(self.backoff_ms * (2 ** min(exponent, 16)), self.max_backoff_ms)
+        state['backoff_until'] = now + backoff
+        return state['backoff_until']
+
+    def seed(self, connection_id, backoff_until, now):
+        """
+        Applies a backoff deadline persisted by another container.
+        """
+        if backoff_until > now:
+            state = self._state(connection_id, now)
+            if backoff_until > state['backoff_until']:
+                state['backoff_until'] = backoff_until
+                state['streak'] = max(state['streak'], self.error_streak)
+
+    def forget(self, connection_id):
+        """
+        Drops the state of a connection that has gone away.
+        """
+        self.connections.pop(connection_id, None)
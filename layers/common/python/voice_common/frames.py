@@ -0,0 +1,141 @@
+"""
+Frame sequencing and playout deadlines.
+
+The message Lambda gives every sendaudio frame a header when it is
+ingested:
+
+    "frame": {"speaker": "<connection id>", "sequence": 42, "origin_ts": 1718000000000.0}
+
+`sequence` increases by one per frame of a speaker (an atomic counter on
+the speaker's connection record) and `origin_ts` is the ingest time in
+epoch milliseconds. The header travels in the event detail and is sent
+to listeners with the audio.
+
+validate_audio drops a frame when:
+
+- it is older than PLAYOUT_DEADLINE_MS (default 1000, 0 disables), since
+  listeners would discard it anyway, or
+- a frame of the same speaker with a higher sequence has already been
+  broadcast, since it would play out of order.
+
+Sent sequences are remembered per container. With FRAME_ORDER_PERSIST=true
+the sequence is also claimed on the speaker's connection record with a
+conditional write, so frames handled by different containers are ordered
+too.
+"""
+import os
+
+from voice_common.metrics import now_ms
+
+PLAYOUT_DEADLINE_MS = float(os.environ.get('PLAYOUT_DEADLINE_MS', '1000'))
+FRAME_ORDER_PERSIST = os.environ.get('FRAME_ORDER_PERSIST', 'false').lower() == 'true'
+
+# Most speakers remembered per container; the least recently heard half is
+# dropped when exceeded
+MAX_TRACKED_SPEAKERS = 10000
+
+# Reasons returned by check_frame() for dropped frames
+DROP_EXPIRED = 'expired'
+DROP_OUT_OF_ORDER = 'out_of_order'
+
+
+def next_sequence(table, speaker):
+    """
+    Increments and returns the speaker's frame counter.
+
+    Args:
+        table: DynamoDB Table resource of the connections table
+        speaker (str): Connection ID of the speaker
+
+    Returns:
+        int: The frame's sequence number, starting at 1 per connection
+
+    Raises:
+        ClientError: ConditionalCheckFailedException if the speaker has no
+                     connection record; the counter never creates one, so
+                     a frame racing $disconnect cannot resurrect a partial
+                     connection that listeners would be scanned for
+    """
+    response = table.update_item(
+        Key={'connectionId': speaker},
+        UpdateExpression='ADD frameSeq :one',
+        ConditionExpression='attribute_exists(connectionId)',
+        ExpressionAttributeValues={':one': 1},
+        ReturnValues='UPDATED_NEW'
+    )
+    return int(response['Attributes']['frameSeq'])
+
+
+def new_frame(speaker, sequence, origin_ts):
+    """
+    Builds the frame header added at ingest.
+
+    Args:
+        speaker (str): Connection ID of the speaker
+        sequence (int): Sequence number from next_sequence()
+        origin_ts (float): Ingest time in epoch milliseconds
+    """
+    return {'speaker': speaker, 'sequence': sequence, 'origin_ts': origin_ts}
+
+
+def get_frame(detail):
+    """
+    Returns the frame header of an event detail, or None for frames
+    published without one.
+    """
+    if not isinstance(detail, dict):
+        return None
+    frame = detail.get('frame')
+    if (not isinstance(frame, dict) or not frame.get('speaker')
+            or not isinstance(frame.get('sequence'), int)
+            or not isinstance(frame.get('origin_ts'), (int, float))):
+        return None
+    return frame
+
+
+def frame_age_ms(frame, now=None):
+    """
+    Returns milliseconds since the frame was ingested.
+    """
+    if now is None:
+        now = now_ms()
+    return now - frame['origin_ts']
+
+
+class FrameOrder:
+    """
+    Highest sequence broadcast per speaker, kept across warm invocations.
+    """
+
+    def __init__(self, deadline_ms=PLAYOUT_DEADLINE_MS):
+        self.deadline_ms = deadline_ms
+        self.speakers = {}
+
+    def check_frame(self, frame, now):
+        """
+        Decides whether a frame is still worth broadcasting and, if so,
+        records its sequence as sent.
+
+        Args:
+            frame (dict): Frame header from get_frame()
+            now (float): Current epoch milliseconds
+
+        Returns:
+            str: None to broadcast, otherwise the drop reason
+                 (DROP_EXPIRED or DROP_OUT_OF_ORDER)
+        """
+        if self.deadline_ms > 0 and frame_age_ms(frame, now) > self.deadline_ms:
+            return DROP_EXPIRED
+        speaker = frame['speaker']
+        last = self.speakers.get(speaker)
+        if last is not None and frame['sequence'] <= last[0]:
+            return DROP_OUT_OF_ORDER
+        if last is None and len(self.speakers) >= MAX_TRACKED_SPEAKERS:
+            self._prune()
+        self.speakers[speaker] = (frame['sequence'], now)
+        return None
+
+    def _prune(self):
+        by_age = sorted(self.speakers, key=lambda speaker: self.speakers[speaker][1])
+        for speaker in by_age[:len(by_age) // 2]:
+            del self.speakers[speaker]
@@ -0,0 +1,187 @@
+"""
+Hot-path-safe logging helpers.
+
+The voice chat functions run once per audio frame, so log volume scales
+with traffic. These helpers keep logging cheap:
+
+- Level gating: LOG_LEVEL (default INFO) sets the base level of the
+  functions' own logger. Callers pass %-style arguments so messages below
+  the level are never formatted.
+- Sampling: LOG_SAMPLE_RATE (0.0-1.0, default 0) is the fraction of
+  invocations that log at DEBUG. The decision is made once per invocation
+  by start_invocation(), so a sampled invocation is logged completely.
+- Redaction: LazyJson serializes a payload only when the record is emitted
+  and passes it through redact(), which replaces audio fields with their
+  size and truncates long strings and lists.
+- Summaries: InvocationSummary accumulates counters during an invocation
+  and emits them as a single record, replacing per-item log lines.
+"""
+import json
+import logging
+import os
+import random
+
+# Base log level for all functions
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+# Fraction of invocations logged at DEBUG
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '0'))
+
+# Longest string kept verbatim by redact()
+MAX_FIELD_LENGTH = int(os.environ.get('LOG_MAX_FIELD_LENGTH', '256'))
+
+# Most list items kept verbatim by redact()
+MAX_LIST_ITEMS = 10
+
+# Keys holding base64 audio; their values are never logged
+AUDIO_KEYS = frozenset(['data', 'audio', 'audio_data', 'body'])
+
+# Most error messages kept per key in an InvocationSummary
+MAX_ERROR_SAMPLES = 3
+
+# Logger shared by the functions. It is a child of the root logger, so its
+# records reach the handler the Lambda runtime attaches to root, while its
+# level (and DEBUG sampling) never changes what other libraries log.
+APP_LOGGER_NAME = 'voice_chat'
+
+# Library loggers pinned to WARNING. At DEBUG, botocore logs every request
+# with its full parameters, which would put raw audio in the logs once per
+# listener per frame.
+QUIET_LOGGERS = ('boto3', 'botocore', 'urllib3', 's3transfer')
+
+
+def get_logger(name=APP_LOGGER_NAME):
+    """
+    Returns a logger set to the configured base level.
+
+    Never returns the root logger: library loggers inherit the root level,
+    so sampling the root logger at DEBUG would turn on botocore's request
+    logging. The AWS SDK loggers are pinned to WARNING as well.
+
+    Args:
+        name (str): Logger name, APP_LOGGER_NAME by default
+
+    Returns:
+        logging.Logger: The configured logger
+    """
+    for quiet in QUIET_LOGGERS:
+        logging.getLogger(quiet).setLevel(logging.WARNING)
+    logger = logging.getLogger(name or APP_LOGGER_NAME)
+    logger.setLevel(LOG_LEVEL)
+    return logger
+
+
+def start_invocation(logger):
+    """
+    Resets the logger level for a new invocation, applying sampling.
+
+    Warm containers reuse the logger, so the level chosen for a sampled
+    invocation must not leak into the next one.
+
+    Args:
+        logger (logging.Logger): Logger returned by get_logger()
+
+    Returns:
+        bool: True if this invocation is sampled for DEBUG logging
+    """
+    sampled = LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE
+    logger.setLevel(logging.DEBUG if sampled else LOG_LEVEL)
+    return sampled
+
+
+def redact(value, key=None):
+    """
+    Returns a copy of value that is safe and small enough to log.
+
+    Audio fields are replaced by a size marker, strings longer than
+    MAX_FIELD_LENGTH are truncated and lists longer than MAX_LIST_ITEMS
+    are cut down with a count of the omitted items.
+
+    Args:
+        value: Any JSON-serializable value
+        key (str): Key under which value was found, used to detect audio
+
+    Returns:
+        The redacted value
+    """
+    if key in AUDIO_KEYS and isinstance(value, str):
+        return f"<redacted {len(value)} chars>"
+    if isinstance(value, dict):
+        return {k: redact(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [redact(v) for v in value[:MAX_LIST_ITEMS]]
+        if len(value) > MAX_LIST_ITEMS:
+            items.append(f"<{len(value) - MAX_LIST_ITEMS} more>")
+        return items
+    if isinstance(value, str) and len(value) > MAX_FIELD_LENGTH:
+        return f"{value[:MAX_FIELD_LENGTH]}...<{len(value) - MAX_FIELD_LENGTH} more chars>"
+    return value
+
+
+class LazyJson:
+    """
+    Defers redaction and JSON serialization until a record is emitted.
+
+    Pass it as a %-style argument: logger.debug("Event: %s", LazyJson(event))
+    costs nothing when DEBUG is disabled.
+    """
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return json.dumps(redact(self.value), default=str)
+
+
+class InvocationSummary:
+    """
+    Accumulates per-invocation counters and emits them as one record.
+
+    Use it in loops instead of logging each iteration:
+
+        summary = InvocationSummary(logger, 'broadcast')
+        for conn in connections:
+            ...
+            summary.incr('successful')
+        summary.emit()
+    """
+
+    def __init__(self, logger, name):
+        self.logger = logger
+        self.name = name
+        self.fields = {}
+        self.errors = {}
+
+    def incr(self, key, amount=1):
+        """
+        Increments a counter.
+        """
+        self.fields[key] = self.fields.get(key, 0) + amount
+
+    def set(self, key, value):
+        """
+        Sets a summary field.
+        """
+        self.fields[key] = value
+
+    def error(self, key, message):
+        """
+        Keeps the first few error messages under key as samples.
+        """
+        samples = self.errors.setdefault(key, [])
+        if len(samples) < MAX_ERROR_SAMPLES:
+            samples.append(message)
+
+    def emit(self, level=logging.INFO):
+        """
+        Logs the summary as a single JSON record.
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        record = {'summary': self.name}
+        record.update(self.fields)
+        if self.errors:
+            record['error_samples'] = self.errors
+        self.logger.log(level, "%s", LazyJson(record))
@@ -0,0 +1,206 @@
+"""
+Frame tracing and CloudWatch Embedded Metric Format (EMF) helpers.
+
+Every audio frame gets a trace when it enters the system in the message
+Lambda. The trace travels inside the EventBridge event detail and each
+stage stamps the time it handled the frame:
+
+    "trace": {
+        "trace_id": "hex-uuid",
+        "stages": {"ingest": 1718000000000.0, "process": ..., ...}
+    }
+
+Stage stamps are wall-clock epoch milliseconds because they are compared
+across Lambda instances, where a monotonic clock has no common origin.
+Durations measured inside a single invocation (S3 PUT, scan, sends) use
+time.perf_counter() instead. Every epoch timestamp, including frame ages
+and backoff deadlines, is read through now_ms(), so replacing `clock`
+runs the pipeline on another time source (the load generator's virtual
+clock).
+
+Metrics are written to stdout as EMF documents. CloudWatch Logs extracts
+them into metrics asynchronously, so publishing them costs no API calls.
+"""
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+# CloudWatch namespace for all voice chat metrics
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'VoiceChat')
+
+# EMF accepts at most 100 values per metric in a single document
+MAX_VALUES_PER_METRIC = 100
+
+# Source of epoch seconds for now_ms()
+clock = time.time
+
+
+def now_ms():
+    """
+    Returns the current wall-clock time in epoch milliseconds.
+    """
+    return clock() * 1000.0
+
+
+def start_trace():
+    """
+    Creates a new trace for a frame entering the system.
+
+    Returns:
+        dict: Trace with a fresh trace_id and the 'ingest' stage stamped
+    """
+    return {
+        'trace_id': uuid.uuid4().hex,
+        'stages': {'ingest': now_ms()}
+    }
+
+
+def get_trace(detail):
+    """
+    Extracts the trace carried in an event detail.
+
+    Events produced before tracing was introduced (or by other producers)
+    carry no trace; a new one is started so the rest of the pipeline can
+    still stamp its stages.
+
+    Args:
+        detail (dict): EventBridge event detail
+
+    Returns:
+        dict: Trace with 'trace_id' and 'stages'
+    """
+    trace = detail.get('trace') if isinstance(detail, dict) else None
+    if not isinstance(trace, dict) or not trace.get('trace_id'):
+        return {'trace_id': uuid.uuid4().hex, 'stages': {}}
+    if not isinstance(trace.get('stages'), dict):
+        trace['stages'] = {}
+    return trace
+
+
+def mark_stage(trace, stage):
+    """
+    Stamps the current time on a trace stage.
+
+    Args:
+        trace (dict): Trace to update
+        stage (str): Stage name (ingest, process, publish, broadcast, ...)
+
+    Returns:
+        float: The recorded epoch milliseconds
+    """
+    timestamp = now_ms()
+    trace['stages'][stage] = timestamp
+    return timestamp
+
+
+def stage_delta(trace, start, end):
+    """
+    Returns the milliseconds elapsed between two stages of a trace.
+
+    Args:
+        trace (dict): Trace containing the stages
+        start (str): Name of the earlier stage
+        end (str): Name of the later stage
+
+    Returns:
+        float: Elapsed milliseconds, or None if either stage is missing
+    """
+    stages = trace.get('stages', {})
+    if start not in stages or end not in stages:
+        return None
+    return stages[end] - stages[start]
+
+
+def percentile(values, pct):
+    """
+    Computes a nearest-rank percentile.
+
+    Args:
+        values (list): Numeric samples
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile value, or None for an empty sample
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = int(round(pct / 100.0 * (len(ordered) - 1)))
+    return ordered[rank]
+
+
+class MetricsLogger:
+    """
+    Collects metrics for one invocation and writes them as EMF documents.
+
+    Create one logger per invocation, record metrics while handling the
+    event and call flush() before returning. A metric recorded several
+    times (e.g. one send time per recipient) is emitted as a value array,
+    which CloudWatch aggregates into a single statistic set.
+    """
+
+    def __init__(self, function_name, namespace=None):
+        self.namespace = namespace or NAMESPACE
+        self.dimensions = {'Function': function_name}
+        self.properties = {}
+        self.metrics = {}
+
+    def put_metric(self, name, value, unit='Milliseconds'):
+        """
+        Records a metric value. None values are ignored so callers can pass
+        stage_delta() results without checking them.
+        """
+        if value is None:
+            return
+        self.metrics.setdefault(name, (unit, []))[1].append(value)
+
+    def set_property(self, key, value):
+        """
+        Adds a searchable, non-metric field (e.g. TraceId) to the documents.
+        """
+        self.properties[key] = value
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Context manager recording the elapsed milliseconds of its block.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.put_metric(name, (time.perf_counter() - start) * 1000.0)
+
+    def flush(self):
+        """
+        Writes the recorded metrics to stdout and resets them.
+
+        Metrics with more values than EMF allows per document are split
+        across several documents sharing the same dimensions and properties.
+        """
+        if not self.metrics:
+            return
+        longest = max(len(values) for _, values in self.metrics.values())
+        for offset in range(0, longest, MAX_VALUES_PER_METRIC):
+            document = {}
+            document.update(self.properties)
+            document.update(self.dimensions)
+            definitions = []
+            for name, (unit, values) in self.metrics.items():
+                chunk = values[offset:offset + MAX_VALUES_PER_METRIC]
+                if not chunk:
+                    continue
+                definitions.append({'Name': name, 'Unit': unit})
+                document[name] = chunk[0] if len(chunk) == 1 else chunk
+            document['_aws'] = {
+                'Timestamp': int(now_ms()),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': [list(self.dimensions.keys())],
+                    'Metrics': definitions
+                }]
+            }
+            print(json.dumps(document))
+        self.metrics = {}
@@ -0,0 +1,204 @@
+"""
+Opt-in sampled profiling for the Lambda handlers.
+
+Wrap a handler with @profiled('function_name'). Profiling is configured
+through environment variables read at import time, so it can be turned on
+for a function by changing its configuration, without deploying code:
+
+- PROFILE_SAMPLE_RATE: fraction of invocations to profile (default 0)
+- PROFILE_MODE:        'cpu' (cProfile), 'memory' (tracemalloc) or 'both'
+- PROFILE_TOP_N:       hotspots/allocation sites in the summary (default 15)
+- PROFILE_OUTPUT:      'log' writes only the summary record to stdout;
+                       's3' also uploads the full profile to AUDIO_BUCKET
+                       under PROFILE_S3_PREFIX (default 'diagnostics/profiles/')
+
+With PROFILE_SAMPLE_RATE unset or 0 the decorator returns the handler
+unchanged, so disabled profiling costs nothing per invocation.
+
+Full CPU profiles are marshalled pstats data (open with pstats.Stats or
+snakeviz); memory profiles are tracemalloc snapshots
+(tracemalloc.Snapshot.load).
+"""
+import functools
+import json
+import os
+import random
+import time
+import uuid
+
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_MODE = os.environ.get('PROFILE_MODE', 'cpu').lower()
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', '15'))
+PROFILE_OUTPUT = os.environ.get('PROFILE_OUTPUT', 'log').lower()
+PROFILE_S3_PREFIX = os.environ.get('PROFILE_S3_PREFIX', 'diagnostics/profiles/')
+
+# Frames kept per tracemalloc allocation traceback
+TRACEMALLOC_FRAMES = 1
+
+
+def profiled(function_name, sample_rate=None):
+    """
+    Decorator profiling a sampled fraction of handler invocations.
+
+    Args:
+        function_name (str): Name used in summaries and S3 keys
+        sample_rate (float): Overrides PROFILE_SAMPLE_RATE
+
+    Returns:
+        callable: Decorator returning the handler itself when disabled
+    """
+    rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+
+    def decorator(handler):
+        if rate <= 0:
+            return handler
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            if rate < 1 and random.random() >= rate:
+                return handler(event, context)
+            return profile_invocation(function_name, handler, event, context)
+
+        return wrapper
+
+    return decorator
+
+
+def profile_invocation(function_name, handler, event, context):
+    """
+    Runs one invocation under cProfile and/or tracemalloc and writes the
+    results. Profiling failures never fail the invocation.
+
+    Returns:
+        The handler's return value
+    """
+    cpu = PROFILE_MODE in ('cpu', 'both')
+    memory = PROFILE_MODE in ('memory', 'both')
+    profiler = None
+
+    if memory:
+        import tracemalloc
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    if cpu:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        return handler(event, context)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000.0
+        snapshot = None
+        peak_kb = None
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            peak_kb = tracemalloc.get_traced_memory()[1] / 1024.0
+            tracemalloc.stop()
+        try:
+            write_profile(function_name, context, duration_ms, profiler, snapshot, peak_kb)
+        except Exception as e:
+            print(json.dumps({'profile': function_name, 'error': str(e)}))
+
+
+def cpu_hotspots(profiler, top_n):
+    """
+    Returns the top_n functions by cumulative time.
+    """
+    import pstats
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}({name})",
+            'ncalls': ncalls,
+            'tottime_ms': round(tottime * 1000.0, 3),
+            'cumtime_ms': round(cumtime * 1000.0, 3),
+        })
+    rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+    return rows[:top_n]
+
+
+def allocation_sites(snapshot, top_n):
+    """
+    Returns the top_n source lines by memory still allocated at the end
+    of the invocation.
+    """
+    rows = []
+    for stat in snapshot.statistics('lineno')[:top_n]:
+        frame = stat.traceback[0]
+        rows.append({
+            'location': f"{os.path.basename(frame.filename)}:{frame.lineno}",
+            'size_kb': round(stat.size / 1024.0, 1),
+            'count': stat.count,
+        })
+    return rows
+
+
+def write_profile(function_name, context, duration_ms, profiler, snapshot, peak_kb):
+    """
+    Logs the compact summary and, with PROFILE_OUTPUT=s3, uploads the
+    full profiles. The summary is always logged; upload failures are
+    recorded in it as 'upload_error'.
+    """
+    request_id = getattr(context, 'aws_request_id', None) or uuid.uuid4().hex
+    summary = {
+        'profile': function_name,
+        'request_id': request_id,
+        'mode': PROFILE_MODE,
+        'duration_ms': round(duration_ms, 3),
+    }
+    if profiler is not None:
+        summary['hotspots'] = cpu_hotspots(profiler, PROFILE_TOP_N)
+    if snapshot is not None:
+        summary['peak_kb'] = round(peak_kb, 1)
+        summary['allocations'] = allocation_sites(snapshot, PROFILE_TOP_N)
+
+    if PROFILE_OUTPUT == 's3':
+        # A failed upload must not cost the summary, which is already computed
+        try:
+            summary['s3_keys'] = upload_profiles(function_name, request_id, profiler, snapshot)
+        except Exception as e:
+            summary['upload_error'] = str(e)
+
+    print(json.dumps(summary))
+
+
+def upload_profiles(function_name, request_id, profiler, snapshot):
+    """
+    Uploads the full profiles to the audio bucket.
+
+    Returns:
+        list: The S3 keys written
+    """
+    from voice_common.clients import get_client
+
+    bucket = os.environ.get('AUDIO_BUCKET')
+    if not bucket:
+        raise ValueError("AUDIO_BUCKET not set, cannot upload profile")
+    prefix = f"{PROFILE_S3_PREFIX}{function_name}/{time.strftime('%Y/%m/%d', time.gmtime())}/{request_id}"
+    s3 = get_client('s3')
+    keys = []
+
+    if profiler is not None:
+        import marshal
+        profiler.create_stats()
+        key = f"{prefix}.prof"
+        s3.put_object(Bucket=bucket, Key=key, Body=marshal.dumps(profiler.stats))
+        keys.append(key)
+
+    if snapshot is not None:
+        path = f"/tmp/{request_id}.tracemalloc"
+        snapshot.dump(path)
+        try:
+            with open(path, 'rb') as f:
+                key = f"{prefix}.tracemalloc"
+                s3.put_object(Bucket=bucket, Key=key, Body=f.read())
+                keys.append(key)
+        finally:
+            os.remove(path)
+
+    return keys
@@ -142,6 +142,24 @@ module "lambda" {
 
   prefix                    = "${var.prefix}-${var.stage}"
   lambda_functions          = var.lambda_functions
+  common_layer_package      = var.common_layer_package
+  log_level                 = var.lambda_log_level
+  log_sample_rate           = var.lambda_log_sample_rate
+  profile_sample_rate       = var.lambda_profile_sample_rate
+  profile_mode              = var.lambda_profile_mode
+  profile_output            = var.lambda_profile_output
+
+  slow_consumer_latency_ms     = var.slow_consumer_latency_ms
+  slow_consumer_lagging_ms     = var.slow_consumer_lagging_ms
+  slow_consumer_lagging_ratio  = var.slow_consumer_lagging_ratio
+  slow_consumer_error_streak   = var.slow_consumer_error_streak
+  degraded_frame_interval      = var.degraded_frame_interval
+  slow_consumer_backoff_ms     = var.slow_consumer_backoff_ms
+  slow_consumer_max_backoff_ms = var.slow_consumer_max_backoff_ms
+  consumer_health_persist      = var.consumer_health_persist
+  playout_deadline_ms          = var.playout_deadline_ms
+  frame_order_persist          = var.frame_order_persist
+
   audio_bucket_name         = aws_s3_bucket.audio_storage.id
   audio_processing_rule_arn = module.eventbridge.audio_processing_rule_arn
   audio_validation_rule_arn = module.eventbridge.audio_validation_rule_arn
@@ -192,6 +210,12 @@ data "archive_file" "validate_audio_function" {
   output_path = "${path.module}/lambda/validate_audio.zip"
 }
 
+data "archive_file" "common_layer" {
+  type        = "zip"
+  source_dir  = "${path.module}/layers/common"
+  output_path = "${path.module}/lambda/common_layer.zip"
+}
+
 # Security Groups Module
 module "security_groups" {
   source              = "./modules/security_groups"
@@ -1,3 +1,11 @@
+# Shared Python Layer (voice_common package, mounted under /opt/python)
+resource "aws_lambda_layer_version" "common" {
+  filename            = var.common_layer_package
+  layer_name          = "${var.prefix}-common"
+  description         = "Shared tracing and metrics helpers for voice chat functions"
+  compatible_runtimes = ["python3.10"]
+}
+
 # Audio Processing Lambda Functions
 resource "aws_lambda_function" "process_audio" {
   filename      = var.lambda_functions.process_audio
@@ -5,14 +13,20 @@ resource "aws_lambda_function" "process_audio" {
   role          = var.lambda_role_arn
   handler       = "lambda_function.lambda_handler"
   runtime       = "python3.10"
+  layers        = [aws_lambda_layer_version.common.arn]
   timeout       = var.process_audio_timeout
   memory_size   = var.process_audio_memory
 
   environment {
     variables = {
-      AUDIO_BUCKET   = var.audio_bucket_name
-      EVENT_BUS_NAME = var.event_bus_name
-      EVENT_SOURCE   = var.event_source
+      AUDIO_BUCKET        = var.audio_bucket_name
+      EVENT_BUS_NAME      = var.event_bus_name
+      EVENT_SOURCE        = var.event_source
+      LOG_LEVEL           = var.log_level
+      LOG_SAMPLE_RATE     = tostring(var.log_sample_rate)
+      PROFILE_SAMPLE_RATE = tostring(var.profile_sample_rate)
+      PROFILE_MODE        = var.profile_mode
+      PROFILE_OUTPUT      = var.profile_output
     }
   }
 
@@ -30,14 +44,33 @@ resource "aws_lambda_function" "validate_audio" {
   role          = var.lambda_role_arn
   handler       = "lambda_function.lambda_handler"
   runtime       = "python3.10"
+  layers        = [aws_lambda_layer_version.common.arn]
   timeout       = var.validate_audio_timeout
   memory_size   = var.validate_audio_memory
 
   environment {
     variables = {
-      CONNECTIONS_TABLE = "${var.project_name}-${var.stage}-connections"
-      EVENT_BUS_NAME    = var.event_bus_name
-      EVENT_SOURCE      = var.event_source
+      CONNECTIONS_TABLE   = "${var.project_name}-${var.stage}-connections"
+      EVENT_BUS_NAME      = var.event_bus_name
+      EVENT_SOURCE        = var.event_source
+      LOG_LEVEL           = var.log_level
+      LOG_SAMPLE_RATE     = tostring(var.log_sample_rate)
+      AUDIO_BUCKET        = var.audio_bucket_name
+      PROFILE_SAMPLE_RATE = tostring(var.profile_sample_rate)
+      PROFILE_MODE        = var.profile_mode
+      PROFILE_OUTPUT      = var.profile_output
+
+      SLOW_CONSUMER_LATENCY_MS     = tostring(var.slow_consumer_latency_ms)
+      SLOW_CONSUMER_LAGGING_MS     = tostring(var.slow_consumer_lagging_ms)
+      SLOW_CONSUMER_LAGGING_RATIO  = tostring(var.slow_consumer_lagging_ratio)
+      SLOW_CONSUMER_ERROR_STREAK   = tostring(var.slow_consumer_error_streak)
+      DEGRADED_FRAME_INTERVAL      = tostring(var.degraded_frame_interval)
+      SLOW_CONSUMER_BACKOFF_MS     = tostring(var.slow_consumer_backoff_ms)
+      SLOW_CONSUMER_MAX_BACKOFF_MS = tostring(var.slow_consumer_max_backoff_ms)
+      CONSUMER_HEALTH_PERSIST      = tostring(var.consumer_health_persist)
+
+      PLAYOUT_DEADLINE_MS = tostring(var.playout_deadline_ms)
+      FRAME_ORDER_PERSIST = tostring(var.frame_order_persist)
     }
   }
 
@@ -56,12 +89,19 @@ resource "aws_lambda_function" "connect" {
   role          = var.lambda_role_arn
   handler       = "lambda_function.lambda_handler"
   runtime       = "python3.10"
+  layers        = [aws_lambda_layer_version.common.arn]
   timeout       = var.websocket_timeout
   memory_size   = var.websocket_memory
 
   environment {
     variables = {
-      CONNECTIONS_TABLE = "${var.project_name}-${var.stage}-connections"
+      CONNECTIONS_TABLE   = "${var.project_name}-${var.stage}-connections"
+      LOG_LEVEL           = var.log_level
+      LOG_SAMPLE_RATE     = tostring(var.log_sample_rate)
+      AUDIO_BUCKET        = var.audio_bucket_name
+      PROFILE_SAMPLE_RATE = tostring(var.profile_sample_rate)
+      PROFILE_MODE        = var.profile_mode
+      PROFILE_OUTPUT      = var.profile_output
     }
   }
 
@@ -79,12 +119,19 @@ resource "aws_lambda_function" "disconnect" {
   role          = var.lambda_role_arn
   handler       = "lambda_function.lambda_handler"
   runtime       = "python3.10"
+  layers        = [aws_lambda_layer_version.common.arn]
   timeout       = var.websocket_timeout
   memory_size   = var.websocket_memory
 
   environment {
     variables = {
-      CONNECTIONS_TABLE = "${var.project_name}-${var.stage}-connections"
+      CONNECTIONS_TABLE   = "${var.project_name}-${var.stage}-connections"
+      LOG_LEVEL           = var.log_level
+      LOG_SAMPLE_RATE     = tostring(var.log_sample_rate)
+      AUDIO_BUCKET        = var.audio_bucket_name
+      PROFILE_SAMPLE_RATE = tostring(var.profile_sample_rate)
+      PROFILE_MODE        = var.profile_mode
+      PROFILE_OUTPUT      = var.profile_output
     }
   }
 
@@ -102,14 +149,21 @@ resource "aws_lambda_function" "message" {
   role          = var.lambda_role_arn
   handler       = "lambda_function.lambda_handler"
   runtime       = "python3.10"
+  layers        = [aws_lambda_layer_version.common.arn]
   timeout       = var.websocket_timeout
   memory_size   = var.websocket_memory
 
   environment {
     variables = {
-      CONNECTIONS_TABLE = "${var.project_name}-${var.stage}-connections"
-      EVENT_BUS_NAME    = var.event_bus_name
-      EVENT_SOURCE      = var.event_source
+      CONNECTIONS_TABLE   = "${var.project_name}-${var.stage}-connections"
+      EVENT_BUS_NAME      = var.event_bus_name
+      EVENT_SOURCE        = var.event_source
+      LOG_LEVEL           = var.log_level
+      LOG_SAMPLE_RATE     = tostring(var.log_sample_rate)
+      AUDIO_BUCKET        = var.audio_bucket_name
+      PROFILE_SAMPLE_RATE = tostring(var.profile_sample_rate)
+      PROFILE_MODE        = var.profile_mode
+      PROFILE_OUTPUT      = var.profile_output
     }
   }
 
@@ -0,0 +1,179 @@
+"""
+Tests for voice_common.consumers.ConsumerHealth.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'layers', 'common', 'python'))
+
+from voice_common import consumers  # noqa: E402
+from voice_common.consumers import ConsumerHealth, SKIP_BACKOFF, SKIP_DEGRADED  # noqa: E402
+
+NOW = 1000000.0
+
+
+def make_health():
+    return ConsumerHealth(slow_latency_ms=100, error_streak=3, degraded_interval=3,
+                          backoff_ms=500, max_backoff_ms=2000, lagging_ms=5, lagging_ratio=2)
+
+
+class HealthyListenerTest(unittest.TestCase):
+
+    def test_fast_success_is_not_tracked(self):
+        health = make_health()
+        health.record_success('a', health.lagging_ms, NOW)
+        self.assertEqual(health.connections, {})
+        self.assertIsNone(health.admit('a', NOW))
+
+    def test_order_keeps_input_when_nothing_is_tracked(self):
+        health = make_health()
+        connections = ['a', 'b', 'c']
+        self.assertIs(health.order(connections), connections)
+
+
+class OrderTest(unittest.TestCase):
+
+    def test_lagging_after_healthy_and_erroring_last(self):
+        health = make_health()
+        health.record_success('slow', 90, NOW)
+        health.record_success('slower', 95, NOW)
+        health.record_error('failing', NOW)
+        self.assertEqual(
+            health.order(['failing', 'slower', 'a', 'slow', 'b']),
+            ['a', 'b', 'slow', 'slower', 'failing'])
+
+
+class LaggingThresholdTest(unittest.TestCase):
+
+    def test_small_constant_lag_is_tracked(self):
+        health = make_health()
+        health.observe_room(0.5)
+        health.record_success('a', 20, NOW)
+        self.assertIn('a', health.connections)
+        self.assertEqual(health.order(['a', 'b']), ['b', 'a'])
+
+    def test_threshold_follows_room_median(self):
+        health = make_health()
+        self.assertEqual(health.lagging_ms, 5)
+        health.observe_room(30)
+        self.assertEqual(health.lagging_ms, 60)
+        health.record_success('a', 40, NOW)
+        self.assertNotIn('a', health.connections)
+        for _ in range(30):
+            health.observe_room(1)
+        self.assertAlmostEqual(health.lagging_ms, 5)
+        health.record_success('a', 40, NOW)
+        self.assertIn('a', health.connections)
+
+
+class DegradedTest(unittest.TestCase):
+
+    def test_every_nth_frame_is_sent(self):
+        health = make_health()
+        health.record_success('a', 200, NOW)
+        decisions = [health.admit('a', NOW + i) for i in range(6)]
+        self.assertEqual(decisions, [SKIP_DEGRADED, SKIP_DEGRADED, None] * 2)
+
+    def test_recovers_and_is_dropped_once_fast(self):
+        health = make_health()
+        health.record_success('a', 200, NOW)
+        for i in range(30):
+            health.record_success('a', 1, NOW + i)
+        self.assertNotIn('a', health.connections)
+        self.assertIsNone(health.admit('a', NOW + 30))
+
+    def test_below_slow_threshold_is_ordered_but_not_degraded(self):
+        health = make_health()
+        health.record_success('a', 50, NOW)
+        self.assertIn('a', health.connections)
+        self.assertIsNone(health.admit('a', NOW))
+        self.assertIsNone(health.admit('a', NOW))
+
+
+class BackoffTest(unittest.TestCase):
+
+    def test_no_backoff_before_streak(self):
+        health = make_health()
+        self.assertIsNone(health.record_error('a', NOW))
+        self.assertIsNone(health.record_error('a', NOW))
+        self.assertIsNone(health.admit('a', NOW))
+
+    def test_backoff_doubles_up_to_cap(self):
+        health = make_health()
+        health.record_error('a', NOW)
+        health.record_error('a', NOW)
+        deadlines = [health.record_error('a', NOW) - NOW for _ in range(5)]
+        self.assertEqual(deadlines, [500, 1000, 2000, 2000, 2000])
+
+    def test_long_streak_does_not_overflow(self):
+        health = make_health()
+        for _ in range(2000):
+            deadline = health.record_error('a', NOW)
+        self.assertEqual(deadline - NOW, 2000)
+
+    def test_skipped_during_backoff_then_probed(self):
+        health = make_health()
+        for _ in range(3):
+            deadline = health.record_error('a', NOW)
+        self.assertEqual(health.admit('a', deadline - 1), SKIP_BACKOFF)
+        self.assertIsNone(health.admit('a', deadline))
+
+    def test_success_clears_streak_and_backoff(self):
+        health = make_health()
+        for _ in range(3):
+            health.record_error('a', NOW)
+        health.record_success('a', 1, NOW + 600)
+        self.assertNotIn('a', health.connections)
+        self.assertIsNone(health.record_error('a', NOW + 700))
+
+    def test_forget(self):
+        health = make_health()
+        health.record_error('a', NOW)
+        health.forget('a')
+        health.forget('a')
+        self.assertEqual(health.connections, {})
+
+
+class SeedTest(unittest.TestCase):
+
+    def test_future_backoff_is_applied(self):
+        health = make_health()
+        health.seed('a', NOW + 1000, NOW)
+        self.assertEqual(health.admit('a', NOW + 999), SKIP_BACKOFF)
+        self.assertIsNone(health.admit('a', NOW + 1000))
+        # A seeded listener counts as at the streak, so one more failure backs off again
+        self.assertEqual(health.record_error('a', NOW + 1000), NOW + 2000)
+
+    def test_past_backoff_is_ignored(self):
+        health = make_health()
+        health.seed('a', NOW - 1, NOW)
+        self.assertEqual(health.connections, {})
+
+    def test_earlier_seed_does_not_shorten_backoff(self):
+        health = make_health()
+        health.seed('a', NOW + 1000, NOW)
+        health.seed('a', NOW + 10, NOW)
+        self.assertEqual(health.admit('a', NOW + 500), SKIP_BACKOFF)
+
+
+class PruneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.limit = consumers.MAX_TRACKED_CONNECTIONS
+        consumers.MAX_TRACKED_CONNECTIONS = 10
+
+    def tearDown(self):
+        consumers.MAX_TRACKED_CONNECTIONS = self.limit
+
+    def test_least_recently_seen_half_is_dropped(self):
+        health = make_health()
+        for i in range(10):
+            health.record_error(f"c{i}", NOW + i)
+        health.record_error('new', NOW + 100)
+        self.assertEqual(sorted(health.connections), sorted(['new'] + [f"c{i}" for i in range(5, 10)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
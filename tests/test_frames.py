@@ -0,0 +1,173 @@
+"""
+Tests for voice_common.frames and the sequence claims made by the
+message and validate_audio handlers.
+"""
+import json
+import os
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'layers', 'common', 'python'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'benchmarks'))
+
+from voice_common import frames  # noqa: E402
+from voice_common.frames import (  # noqa: E402
+    FrameOrder, DROP_EXPIRED, DROP_OUT_OF_ORDER, get_frame, frame_age_ms, new_frame, next_sequence
+)
+import local_aws  # noqa: E402
+from botocore.exceptions import ClientError, ParamValidationError  # noqa: E402
+
+NOW = 1718000000000.0
+
+
+class GetFrameTest(unittest.TestCase):
+
+    def test_valid_header(self):
+        frame = new_frame('a', 1, NOW)
+        self.assertEqual(get_frame({'frame': frame}), frame)
+
+    def test_missing_or_malformed_header(self):
+        for detail in (None, {}, {'frame': 'a'},
+                       {'frame': {'speaker': '', 'sequence': 1, 'origin_ts': NOW}},
+                       {'frame': {'speaker': 'a', 'sequence': '1', 'origin_ts': NOW}},
+                       {'frame': {'speaker': 'a', 'sequence': 1, 'origin_ts': None}}):
+            self.assertIsNone(get_frame(detail), detail)
+
+    def test_age(self):
+        self.assertEqual(frame_age_ms(new_frame('a', 1, NOW), NOW + 250), 250)
+
+
+class FrameOrderTest(unittest.TestCase):
+
+    def test_expired_frame_is_dropped_and_not_recorded(self):
+        order = FrameOrder(deadline_ms=1000)
+        self.assertEqual(order.check_frame(new_frame('a', 1, NOW), NOW + 1001), DROP_EXPIRED)
+        self.assertEqual(order.speakers, {})
+        self.assertIsNone(order.check_frame(new_frame('a', 2, NOW), NOW + 1000))
+
+    def test_zero_deadline_disables_expiry(self):
+        order = FrameOrder(deadline_ms=0)
+        self.assertIsNone(order.check_frame(new_frame('a', 1, NOW), NOW + 60000))
+
+    def test_repeated_and_older_sequences_are_dropped(self):
+        order = FrameOrder(deadline_ms=1000)
+        self.assertIsNone(order.check_frame(new_frame('a', 5, NOW), NOW))
+        self.assertEqual(order.check_frame(new_frame('a', 5, NOW), NOW), DROP_OUT_OF_ORDER)
+        self.assertEqual(order.check_frame(new_frame('a', 4, NOW), NOW), DROP_OUT_OF_ORDER)
+        self.assertIsNone(order.check_frame(new_frame('a', 7, NOW), NOW))
+        self.assertEqual(order.check_frame(new_frame('a', 6, NOW), NOW), DROP_OUT_OF_ORDER)
+
+    def test_speakers_are_independent(self):
+        order = FrameOrder(deadline_ms=1000)
+        self.assertIsNone(order.check_frame(new_frame('a', 5, NOW), NOW))
+        self.assertIsNone(order.check_frame(new_frame('b', 1, NOW), NOW))
+
+
+class PruneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.limit = frames.MAX_TRACKED_SPEAKERS
+        frames.MAX_TRACKED_SPEAKERS = 10
+
+    def tearDown(self):
+        frames.MAX_TRACKED_SPEAKERS = self.limit
+
+    def test_least_recently_heard_half_is_dropped(self):
+        order = FrameOrder(deadline_ms=0)
+        for i in range(10):
+            order.check_frame(new_frame(f"s{i}", 1, NOW), NOW + i)
+        order.check_frame(new_frame('new', 1, NOW), NOW + 100)
+        self.assertEqual(sorted(order.speakers), sorted(['new'] + [f"s{i}" for i in range(5, 10)]))
+
+
+class NextSequenceTest(unittest.TestCase):
+
+    def test_counts_per_speaker(self):
+        dynamodb = local_aws.LocalDynamoDB()
+        dynamodb.add_connections(['a', 'b'])
+        table = dynamodb.Table(local_aws.CONNECTIONS_TABLE)
+        self.assertEqual([next_sequence(table, 'a') for _ in range(3)], [1, 2, 3])
+        self.assertEqual(next_sequence(table, 'b'), 1)
+
+    def test_never_creates_a_connection_record(self):
+        dynamodb = local_aws.LocalDynamoDB()
+        table = dynamodb.Table(local_aws.CONNECTIONS_TABLE)
+        with self.assertRaises(local_aws.ConditionalCheckFailedException):
+            next_sequence(table, 'gone')
+        self.assertEqual(table.items, {})
+
+    def test_message_rejects_unregistered_sender(self):
+        message = local_aws.load_function('message')
+        dynamodb = local_aws.LocalDynamoDB()
+        events = local_aws.LocalEventBus()
+        local_aws.install(dynamodb=dynamodb, events=events)
+        self.addCleanup(local_aws.clients.reset)
+        with local_aws.quiet_output():
+            response = message.lambda_handler(
+                local_aws.websocket_event('gone', json.dumps({'action': 'sendaudio', 'data': ''}), 'sendaudio'), None)
+        self.assertEqual(response['statusCode'], 410)
+        self.assertEqual(json.loads(response['body']), {'error': 'Not connected'})
+        self.assertEqual(dynamodb.tables.get(local_aws.CONNECTIONS_TABLE, {}), {})
+        self.assertNotIn('put_events', events.calls)
+
+
+class FailingDynamoDB:
+
+    def __init__(self, error):
+        self.error = error
+
+    def update_item(self, **kwargs):
+        raise self.error
+
+
+class ClaimSequenceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.validate_audio = local_aws.load_function('validate_audio')
+        self.dynamodb = local_aws.LocalDynamoDB()
+        local_aws.install(dynamodb=self.dynamodb)
+
+    def tearDown(self):
+        local_aws.clients.reset()
+
+    def claim(self, speaker, sequence):
+        with local_aws.quiet_output():
+            return self.validate_audio.claim_sequence(new_frame(speaker, sequence, NOW))
+
+    def test_newer_frames_claim_and_older_ones_lose(self):
+        self.dynamodb.add_connections(['a'])
+        self.assertTrue(self.claim('a', 2))
+        self.assertFalse(self.claim('a', 2))
+        self.assertFalse(self.claim('a', 1))
+        self.assertTrue(self.claim('a', 3))
+
+    def test_gone_speaker_is_let_through_without_a_record(self):
+        self.assertTrue(self.claim('gone', 1))
+        self.assertEqual(self.dynamodb.tables.get(local_aws.CONNECTIONS_TABLE, {}), {})
+
+    def test_failed_claim_is_let_through(self):
+        throttled = ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException',
+                                           'Message': 'Rate exceeded'}}, 'UpdateItem')
+        for error in (throttled, ParamValidationError(report='Unknown parameter')):
+            local_aws.clients.set_client('dynamodb', FailingDynamoDB(error))
+            self.assertTrue(self.claim('a', 1))
+
+    def test_claim_request_is_valid_for_pinned_botocore(self):
+        # The real client validates parameters before sending, so an
+        # unsupported ReturnValuesOnConditionCheckFailure would fail every claim
+        import boto3
+        from botocore.stub import Stubber
+        client = boto3.client('dynamodb', region_name='us-east-1',
+                              aws_access_key_id='test', aws_secret_access_key='test')
+        stubber = Stubber(client)
+        stubber.add_client_error('update_item', service_error_code='ConditionalCheckFailedException',
+                                 modeled_fields={'Item': {'connectionId': {'S': 'a'}, 'lastSentSeq': {'N': '2'}}})
+        local_aws.clients.set_client('dynamodb', client)
+        with stubber:
+            self.assertFalse(self.claim('a', 1))
+            stubber.assert_no_pending_responses()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Tests for voice_common.logs redaction and logger levels.
+"""
+import json
+import logging
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'layers', 'common', 'python'))
+
+from voice_common import logs  # noqa: E402
+from voice_common.logs import LazyJson, MAX_FIELD_LENGTH, MAX_LIST_ITEMS, redact  # noqa: E402
+
+AUDIO = 'UklGRiQAAABXQVZF' * 400
+
+
+class RedactTest(unittest.TestCase):
+
+    def test_audio_keys_are_replaced_by_their_size(self):
+        for key in logs.AUDIO_KEYS:
+            self.assertEqual(redact({key: AUDIO}), {key: f"<redacted {len(AUDIO)} chars>"})
+
+    def test_audio_keys_holding_objects_are_redacted_inside(self):
+        # e.g. a pong's 'data' carries connection details, not audio
+        self.assertEqual(redact({'data': {'connectionId': 'abc', 'audio': 'xyz'}}),
+                         {'data': {'connectionId': 'abc', 'audio': '<redacted 3 chars>'}})
+
+    def test_long_strings_are_truncated(self):
+        value = 'x' * (MAX_FIELD_LENGTH + 10)
+        self.assertEqual(redact({'error': value}),
+                         {'error': 'x' * MAX_FIELD_LENGTH + '...<10 more chars>'})
+        self.assertEqual(redact('short'), 'short')
+
+    def test_long_lists_are_cut_with_a_count(self):
+        connections = [f"conn-{i}" for i in range(MAX_LIST_ITEMS + 5)]
+        self.assertEqual(redact(connections), connections[:MAX_LIST_ITEMS] + ['<5 more>'])
+        self.assertEqual(redact(connections[:3]), connections[:3])
+
+    def test_nested_event_detail(self):
+        event = {
+            'detail-type': 'SendAudioEvent',
+            'detail': {
+                'status': 'PROCESSED',
+                'message': {'action': 'sendaudio', 'data': AUDIO, 'author': 'c1'},
+                'websocket_context': {'connection_id': 'c1'},
+                'listeners': [{'connectionId': f"c{i}", 'audio': AUDIO} for i in range(20)],
+            },
+        }
+        redacted = redact(event)
+        detail = redacted['detail']
+        self.assertEqual(detail['message'], {'action': 'sendaudio', 'data': f"<redacted {len(AUDIO)} chars>",
+                                             'author': 'c1'})
+        self.assertEqual(detail['websocket_context'], {'connection_id': 'c1'})
+        self.assertEqual(len(detail['listeners']), MAX_LIST_ITEMS + 1)
+        self.assertEqual(detail['listeners'][-1], '<10 more>')
+        self.assertNotIn(AUDIO, json.dumps(redacted))
+        # The original event is left untouched
+        self.assertEqual(event['detail']['message']['data'], AUDIO)
+
+    def test_lazy_json_is_redacted(self):
+        text = str(LazyJson({'body': json.dumps({'action': 'sendaudio', 'data': AUDIO})}))
+        self.assertNotIn(AUDIO, text)
+        self.assertIn('<redacted', text)
+
+
+class LoggerLevelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sample_rate = logs.LOG_SAMPLE_RATE
+        self.botocore_level = logging.getLogger('botocore').level
+        self.root_level = logging.getLogger().level
+
+    def tearDown(self):
+        logs.LOG_SAMPLE_RATE = self.sample_rate
+        logging.getLogger('botocore').setLevel(self.botocore_level)
+        logging.getLogger().setLevel(self.root_level)
+
+    def test_sampled_invocation_keeps_sdk_loggers_at_warning(self):
+        logging.getLogger('botocore').setLevel(logging.DEBUG)
+        logger = logs.get_logger()
+        logs.LOG_SAMPLE_RATE = 1.0
+        self.assertTrue(logs.start_invocation(logger))
+
+        self.assertEqual(logger.name, logs.APP_LOGGER_NAME)
+        self.assertTrue(logger.isEnabledFor(logging.DEBUG))
+        self.assertEqual(logging.getLogger().level, self.root_level)
+        for name in logs.QUIET_LOGGERS:
+            self.assertEqual(logging.getLogger(name).level, logging.WARNING)
+        self.assertFalse(logging.getLogger('botocore.endpoint').isEnabledFor(logging.DEBUG))
+
+    def test_sampling_does_not_leak_into_the_next_invocation(self):
+        logger = logs.get_logger()
+        logs.LOG_SAMPLE_RATE = 1.0
+        logs.start_invocation(logger)
+        logs.LOG_SAMPLE_RATE = 0.0
+        self.assertFalse(logs.start_invocation(logger))
+        self.assertEqual(logger.level, logging.getLevelName(logs.LOG_LEVEL))
+
+
+if __name__ == '__main__':
+    unittest.main()
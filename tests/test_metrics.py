@@ -0,0 +1,79 @@
+"""
+Tests for voice_common.metrics EMF output.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'layers', 'common', 'python'))
+
+from voice_common.metrics import MetricsLogger, MAX_VALUES_PER_METRIC  # noqa: E402
+
+
+def flush(metrics):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        metrics.flush()
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def metric_names(document):
+    return [metric['Name'] for metric in document['_aws']['CloudWatchMetrics'][0]['Metrics']]
+
+
+class FlushTest(unittest.TestCase):
+
+    def test_long_value_arrays_are_split(self):
+        metrics = MetricsLogger('validate_audio', namespace='Test')
+        metrics.set_property('TraceId', 'abc')
+        values = list(range(2 * MAX_VALUES_PER_METRIC + 1))
+        for value in values:
+            metrics.put_metric('SendTime', value)
+        metrics.put_metric('FanoutP99', 7.5)
+
+        documents = flush(metrics)
+        self.assertEqual(len(documents), 3)
+        self.assertEqual(documents[0]['SendTime'] + documents[1]['SendTime'] + [documents[2]['SendTime']],
+                         values)
+        self.assertEqual([len(document['SendTime']) for document in documents[:2]],
+                         [MAX_VALUES_PER_METRIC] * 2)
+        for document in documents:
+            self.assertEqual(document['TraceId'], 'abc')
+            self.assertEqual(document['Function'], 'validate_audio')
+            self.assertEqual(document['_aws']['CloudWatchMetrics'][0]['Namespace'], 'Test')
+            self.assertEqual(document['_aws']['CloudWatchMetrics'][0]['Dimensions'], [['Function']])
+        # Shorter metrics go in the first document only
+        self.assertEqual(metric_names(documents[0]), ['SendTime', 'FanoutP99'])
+        self.assertEqual(metric_names(documents[1]), ['SendTime'])
+        self.assertNotIn('FanoutP99', documents[1])
+
+    def test_single_value_is_a_scalar(self):
+        metrics = MetricsLogger('message')
+        metrics.put_metric('Skipped', 3, unit='Count')
+        documents = flush(metrics)
+        self.assertEqual(len(documents), 1)
+        self.assertEqual(documents[0]['Skipped'], 3)
+        self.assertEqual(documents[0]['_aws']['CloudWatchMetrics'][0]['Metrics'],
+                         [{'Name': 'Skipped', 'Unit': 'Count'}])
+
+    def test_none_values_are_ignored(self):
+        metrics = MetricsLogger('message')
+        metrics.put_metric('ProcessToBroadcast', None)
+        self.assertEqual(flush(metrics), [])
+        metrics.put_metric('ProcessToBroadcast', None)
+        metrics.put_metric('ProcessToBroadcast', 4.0)
+        self.assertEqual(flush(metrics)[0]['ProcessToBroadcast'], 4.0)
+
+    def test_flush_resets(self):
+        metrics = MetricsLogger('message')
+        metrics.put_metric('SendTime', 1.0)
+        flush(metrics)
+        self.assertEqual(flush(metrics), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Tests for voice_common.profiling summaries.
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'layers', 'common', 'python'))
+
+from voice_common import clients, profiling  # noqa: E402
+
+
+class AccessDeniedS3:
+
+    def put_object(self, **kwargs):
+        raise Exception("An error occurred (AccessDenied) when calling the PutObject operation: Access Denied")
+
+
+class RecordingS3:
+
+    def __init__(self):
+        self.keys = []
+
+    def put_object(self, Bucket, Key, Body):
+        self.keys.append(Key)
+        return {}
+
+
+def handler(event, context):
+    return sum(range(1000))
+
+
+class WriteProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = (profiling.PROFILE_MODE, profiling.PROFILE_OUTPUT, os.environ.get('AUDIO_BUCKET'))
+        profiling.PROFILE_MODE = 'both'
+        profiling.PROFILE_OUTPUT = 's3'
+        os.environ['AUDIO_BUCKET'] = 'audio'
+
+    def tearDown(self):
+        profiling.PROFILE_MODE, profiling.PROFILE_OUTPUT, bucket = self.settings
+        if bucket is None:
+            os.environ.pop('AUDIO_BUCKET', None)
+        else:
+            os.environ['AUDIO_BUCKET'] = bucket
+        clients.reset()
+
+    def profile(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = profiling.profile_invocation('test', handler, {}, None)
+        self.assertEqual(result, handler({}, None))
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        return json.loads(lines[0])
+
+    def test_summary_is_logged_when_upload_fails(self):
+        clients.set_client('s3', AccessDeniedS3())
+        summary = self.profile()
+        self.assertIn('AccessDenied', summary['upload_error'])
+        self.assertNotIn('s3_keys', summary)
+        self.assertTrue(summary['hotspots'])
+        self.assertTrue(summary['allocations'])
+
+    def test_uploaded_keys_are_logged(self):
+        s3 = RecordingS3()
+        clients.set_client('s3', s3)
+        summary = self.profile()
+        self.assertEqual(summary['s3_keys'], s3.keys)
+        self.assertEqual([key.rsplit('.', 1)[1] for key in s3.keys], ['prof', 'tracemalloc'])
+        self.assertNotIn('upload_error', summary)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -127,6 +127,102 @@ variable "lambda_functions" {
   }
 }
 
+variable "common_layer_package" {
+  description = "Path to the deployment package of the shared Python layer"
+  type        = string
+  default     = "lambda/common_layer.zip"
+}
+
+variable "lambda_log_level" {
+  description = "Base log level for Lambda functions (DEBUG, INFO, WARNING, ERROR)"
+  type        = string
+  default     = "INFO"
+}
+
+variable "lambda_log_sample_rate" {
+  description = "Fraction of Lambda invocations (0.0-1.0) logged at DEBUG level"
+  type        = number
+  default     = 0
+}
+
+variable "lambda_profile_sample_rate" {
+  description = "Fraction of Lambda invocations (0.0-1.0) run under the profiler; 0 disables profiling"
+  type        = number
+  default     = 0
+}
+
+variable "lambda_profile_mode" {
+  description = "Profiler to run on sampled Lambda invocations (cpu, memory or both)"
+  type        = string
+  default     = "cpu"
+}
+
+variable "lambda_profile_output" {
+  description = "Where Lambda profiles go: log (summary only) or s3 (summary plus full profile in the audio bucket)"
+  type        = string
+  default     = "log"
+}
+
+variable "slow_consumer_latency_ms" {
+  description = "Smoothed post latency (ms) above which a listener only gets every degraded_frame_interval-th frame"
+  type        = number
+  default     = 150
+}
+
+variable "slow_consumer_lagging_ms" {
+  description = "Minimum post latency (ms) at which a listener is sent to after the rest of the room"
+  type        = number
+  default     = 5
+}
+
+variable "slow_consumer_lagging_ratio" {
+  description = "A listener is sent to after the rest once a post takes this many times the room's median post time"
+  type        = number
+  default     = 2
+}
+
+variable "slow_consumer_error_streak" {
+  description = "Consecutive failed posts after which a listener is skipped for a backoff"
+  type        = number
+  default     = 3
+}
+
+variable "degraded_frame_interval" {
+  description = "Send every Nth frame to listeners over slow_consumer_latency_ms"
+  type        = number
+  default     = 2
+}
+
+variable "slow_consumer_backoff_ms" {
+  description = "First backoff (ms) for a failing listener; doubles per further failure"
+  type        = number
+  default     = 500
+}
+
+variable "slow_consumer_max_backoff_ms" {
+  description = "Upper bound (ms) for a failing listener's backoff"
+  type        = number
+  default     = 10000
+}
+
+variable "consumer_health_persist" {
+  description = "Store listener backoff on the connection record so all validate_audio containers honour it"
+  type        = bool
+  default     = false
+}
+
+variable "playout_deadline_ms" {
+  description = "Frames older than this (ms since ingest) are dropped instead of broadcast; 0 disables"
+  type        = number
+  default     = 1000
+}
+
+variable "frame_order_persist" {
+  description = "Claim frame sequences on the speaker's connection record so reordering across validate_audio containers is caught"
+  type        = bool
+  default     = false
+}
+
 # Security Group Configuration
 variable "allowed_game_ips" {
   description = "List of IPs allowed to connect to the game server"